@@ -18,6 +18,92 @@ function loadJson(path) {
   return fetch(path).then((res) => res.json());
 }
 
+// Pack de datos: pack_index.json (sin cache) apunta a data/pack.<hash>.ndjson
+// con el offset y la longitud de cada grafica. Cada grafica pide solo su
+// rango de bytes; si el servidor no admite rangos se descarga el pack una vez.
+// Si el pack falla (p. ej. un indice antiguo tras publicar), se usa el JSON
+// suelto de la grafica.
+let packIndex = null;
+let packBuffer = null;
+
+function loadPackIndex() {
+  if (!packIndex) {
+    packIndex = fetch('data/pack_index.json', { cache: 'no-cache' })
+      .then((res) => (res.ok ? res.json() : null))
+      .catch(() => null);
+  }
+  return packIndex;
+}
+
+function loadPackRange(index, entry) {
+  const url = `data/${index.file}`;
+  const end = entry.offset + entry.length - 1;
+  const slice = (buffer) => buffer.slice(entry.offset, end + 1);
+  if (packBuffer) {
+    return packBuffer.then(slice);
+  }
+  return fetch(url, { headers: { Range: `bytes=${entry.offset}-${end}` } }).then((res) => {
+    if (!res.ok) {
+      throw new Error(`${url}: HTTP ${res.status}`);
+    }
+    if (res.status === 206) {
+      return res.arrayBuffer();
+    }
+    if (!packBuffer) {
+      packBuffer = res.arrayBuffer();
+    } else if (res.body) {
+      res.body.cancel();
+    }
+    return packBuffer.then(slice);
+  });
+}
+
+function verifyEntry(buffer, entry) {
+  // sha256 del indice: un rango de otro pack (o corrupto) no se usa.
+  if (!(window.crypto && window.crypto.subtle)) {
+    return Promise.resolve(buffer);
+  }
+  return window.crypto.subtle.digest('SHA-256', buffer).then((digest) => {
+    const hex = Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+    if (hex !== entry.sha256) {
+      throw new Error('sha256 no coincide');
+    }
+    return buffer;
+  });
+}
+
+function loadChart(name) {
+  return loadPackIndex().then((index) => {
+    const entry = index && index.charts[name];
+    if (!entry) {
+      return loadJson(`data/${name}.json`);
+    }
+    return loadPackRange(index, entry)
+      .then((buffer) => verifyEntry(buffer, entry))
+      .then((buffer) => JSON.parse(new TextDecoder().decode(buffer)))
+      .catch(() => loadJson(`data/${name}.json`));
+  });
+}
+
+function whenVisible(target, callback) {
+  const el = document.getElementById(target);
+  if (!el || !('IntersectionObserver' in window)) {
+    callback();
+    return;
+  }
+  const observer = new IntersectionObserver((entries) => {
+    if (entries.some((entry) => entry.isIntersecting)) {
+      observer.disconnect();
+      callback();
+    }
+  }, { rootMargin: '300px 0px' });
+  observer.observe(el);
+}
+
+function lazyChart(target, name, render) {
+  whenVisible(target, () => loadChart(name).then(render));
+}
+
 function layoutFor(target, extra) {
   const el = document.getElementById(target);
   const rect = el.getBoundingClientRect();
@@ -82,6 +168,44 @@ function plotLine(target, x, y, name, title, xLabel, yLabel) {
   }), CONFIG);
 }
 
+function plotLineWithBand(target, x, y, low, high, title, xLabel, yLabel) {
+  if (!x.length) {
+    plotEmpty(target);
+    return;
+  }
+  const traces = [];
+  if (low && high) {
+    traces.push({
+      x: [...x, ...x.slice().reverse()],
+      y: [...high, ...low.slice().reverse()],
+      type: 'scatter',
+      mode: 'lines',
+      fill: 'toself',
+      fillcolor: 'rgba(225, 6, 0, 0.15)',
+      line: { width: 0 },
+      connectgaps: true,
+      hoverinfo: 'skip',
+      name: 'IC 95%'
+    });
+  }
+  traces.push({
+    x,
+    y,
+    type: 'scatter',
+    mode: 'lines+markers',
+    marker: { color: COLORS.red },
+    line: { color: COLORS.red },
+    name: 'Rho'
+  });
+  setChartHeight(target, 420);
+  Plotly.newPlot(target, traces, layoutFor(target, {
+    title: { text: title, x: 0, xanchor: 'left' },
+    showlegend: false,
+    xaxis: { title: { text: xLabel, standoff: 12 } },
+    yaxis: { title: { text: yLabel, standoff: 12 } }
+  }), CONFIG);
+}
+
 function plotBar(target, x, y, orientation, title, xLabel, yLabel) {
   if (!x.length && !y.length) {
     plotEmpty(target);
@@ -203,6 +327,54 @@ function plotHeatmap(target, data, title, xLabel, yLabel) {
   Plotly.newPlot(target, [trace], layout, CONFIG);
 }
 
+function transitionRows(transitions, decadeIndex) {
+  const [, nGrid, nFinish] = transitions.shape;
+  const offset = decadeIndex * nGrid * nFinish;
+  const rows = [];
+  for (let g = 0; g < nGrid; g += 1) {
+    const start = offset + g * nFinish;
+    const counts = transitions.counts.slice(start, start + nFinish);
+    const total = counts.reduce((sum, value) => sum + value, 0);
+    rows.push(counts.map((value) => (total ? value / total : null)));
+  }
+  return rows;
+}
+
+function plotTransitionHeatmap(target, transitions, title, xLabel, yLabel) {
+  if (!transitions || !transitions.decades.length) {
+    plotEmpty(target);
+    return;
+  }
+  const [, nGrid, nFinish] = transitions.shape;
+  const x = ['DNF', ...Array.from({ length: nFinish - 1 }, (_, i) => String(i + 1))];
+  const y = Array.from({ length: nGrid }, (_, i) => i + 1);
+  const last = transitions.decades.length - 1;
+  const traces = transitions.decades.map((decade, i) => ({
+    z: transitionRows(transitions, i),
+    x,
+    y,
+    type: 'heatmap',
+    colorscale: 'Reds',
+    zmin: 0,
+    zmax: 1,
+    visible: i === last,
+    name: String(decade),
+    hovertemplate: 'Grid %{y} -> %{x}: %{z:.2f}<extra></extra>'
+  }));
+  const buttons = transitions.decades.map((decade, i) => ({
+    label: String(decade),
+    method: 'update',
+    args: [{ visible: transitions.decades.map((_, j) => j === i) }]
+  }));
+  setChartHeight(target, heatmapHeightFor(y));
+  Plotly.newPlot(target, traces, layoutFor(target, {
+    title: { text: title, x: 0, xanchor: 'left' },
+    xaxis: { title: { text: xLabel, standoff: 12 }, type: 'category' },
+    yaxis: { title: { text: yLabel, standoff: 12 }, autorange: 'reversed' },
+    updatemenus: [{ buttons, active: last, x: 1, xanchor: 'right', y: 1.12, yanchor: 'top' }]
+  }), CONFIG);
+}
+
 function plotBarWithCI(target, data, title, xLabel, yLabel) {
   if (!data.decades || !data.decades.length) {
     plotEmpty(target);
@@ -261,7 +433,7 @@ function plotScatterWithLine(target, x, y, title, xLabel, yLabel) {
 }
 
 function init() {
-  loadJson('data/b1_01.json').then((data) => plotLine(
+  lazyChart('chart-b1-01', 'b1_01', (data) => plotLine(
     'chart-b1-01',
     data.years,
     data.pct,
@@ -270,14 +442,14 @@ function init() {
     'Ano',
     '% victorias'
   ));
-  loadJson('data/b1_02.json').then((data) => plotHeatmap(
+  lazyChart('chart-b1-02', 'b1_02', (data) => plotHeatmap(
     'chart-b1-02',
     data,
     'BLOQUE 1 - Share de victorias por decada y equipo',
     'Equipo',
     'Decada'
   ));
-  loadJson('data/b1_03a.json').then((data) => plotBar(
+  lazyChart('chart-b1-03a', 'b1_03a', (data) => plotBar(
     'chart-b1-03a',
     data.values,
     data.labels,
@@ -286,7 +458,7 @@ function init() {
     'Titulos',
     'Piloto'
   ));
-  loadJson('data/b1_03b.json').then((data) => plotBar(
+  lazyChart('chart-b1-03b', 'b1_03b', (data) => plotBar(
     'chart-b1-03b',
     data.values,
     data.labels,
@@ -296,16 +468,17 @@ function init() {
     'Equipo'
   ));
 
-  loadJson('data/b2_01.json').then((data) => plotLine(
+  lazyChart('chart-b2-01', 'b2_01', (data) => plotLineWithBand(
     'chart-b2-01',
     data.years,
     data.rho,
-    '',
+    data.ci_low,
+    data.ci_high,
     'BLOQUE 2 - Correlacion Grid vs Posicion final',
     'Ano',
     'Rho Spearman'
   ));
-  loadJson('data/b2_02.json').then((data) => {
+  lazyChart('chart-b2-02', 'b2_02', (data) => {
     setChartHeight('chart-b2-02', 420);
     const traces = data.traces.map((trace) => ({
       x: trace.x,
@@ -319,15 +492,22 @@ function init() {
       xaxis: { title: { text: 'Posicion de salida', standoff: 12 } },
       yaxis: { title: { text: 'Probabilidad de podio', standoff: 12 } }
     }), CONFIG);
+    plotTransitionHeatmap(
+      'chart-b2-02b',
+      data.transitions,
+      'BLOQUE 2 - Matriz grid -> posicion final',
+      'Posicion final',
+      'Posicion de salida'
+    );
   });
-  loadJson('data/b2_03.json').then((data) => plotBox(
+  lazyChart('chart-b2-03', 'b2_03', (data) => plotBox(
     'chart-b2-03',
     data.traces,
     'BLOQUE 2 - Delta posiciones por decada',
     'Posicion final - grid'
   ));
 
-  loadJson('data/b3_01.json').then((data) => plotScatter(
+  lazyChart('chart-b3-01', 'b3_01', (data) => plotScatter(
     'chart-b3-01',
     data.x,
     data.y,
@@ -336,14 +516,14 @@ function init() {
     'Tiempo total en boxes (s)',
     'Posicion final'
   ));
-  loadJson('data/b3_02.json').then((data) => plotBarWithCI(
+  lazyChart('chart-b3-02', 'b3_02', (data) => plotBarWithCI(
     'chart-b3-02',
     data,
     'BLOQUE 3 - Efecto marginal por decada',
     'Decada',
     'Delta posiciones por +1s'
   ));
-  loadJson('data/b3_03.json').then((data) => plotHist(
+  lazyChart('chart-b3-03', 'b3_03', (data) => plotHist(
     'chart-b3-03',
     data.values,
     'BLOQUE 3 - Errores graves en boxes',
@@ -351,7 +531,7 @@ function init() {
     'Frecuencia'
   ));
 
-  loadJson('data/b4_01.json').then((data) => plotBar(
+  lazyChart('chart-b4-01', 'b4_01', (data) => plotBar(
     'chart-b4-01',
     data.years,
     data.pct,
@@ -360,14 +540,14 @@ function init() {
     'Ano',
     '% puntos sprint'
   ));
-  loadJson('data/b4_02.json').then((data) => plotHist(
+  lazyChart('chart-b4-02', 'b4_02', (data) => plotHist(
     'chart-b4-02',
     data.values,
     'BLOQUE 4 - Cambios de posicion inducidos por sprint',
     'Delta posicion',
     'Frecuencia'
   ));
-  loadJson('data/b4_03.json').then((data) => {
+  lazyChart('chart-b4-03', 'b4_03', (data) => {
     setChartHeight('chart-b4-03', 420);
     const traces = [
       { label: 'Con sprint', values: data.sprint },
@@ -375,7 +555,7 @@ function init() {
     ];
     plotBox('chart-b4-03', traces, 'BLOQUE 4 - Imprevisibilidad sprint vs no sprint', 'Varianza top-10');
   });
-  loadJson('data/b4_04.json').then((data) => plotScatterWithLine(
+  lazyChart('chart-b4-04', 'b4_04', (data) => plotScatterWithLine(
     'chart-b4-04',
     data.margins,
     data.impacts,
@@ -1,18 +1,51 @@
 ﻿from pathlib import Path
+import argparse
 import csv
-import shutil
+import time
 
-from src.data_loader import load_csv
-from src.interactive_data import export_interactive_data
-from src.plots_block1 import plot_b1_01, plot_b1_02, plot_b1_03
-from src.plots_block2 import plot_b2_01, plot_b2_02, plot_b2_03
-from src.plots_block3 import plot_b3_01, plot_b3_02, plot_b3_03
-from src.plots_block4 import plot_b4_01, plot_b4_02, plot_b4_03, plot_b4_04
+import pandas as pd
+
+from src.database import DB_PATH, benchmark, import_csvs
+from src.incremental import ingest_directory
+from src.interactive_data import export_incremental_data, write_data_pack
+from src.pipeline import (
+    DATASETS,
+    DEFAULT_PIT_PERCENTILE,
+    STAGES,
+    affected_stages,
+    collect_manifest,
+    fingerprint,
+    get_pit_percentile,
+    load_frames,
+    refresh_derived,
+    run_multiples,
+    run_stages,
+    set_pit_percentile,
+)
+from src.plot_utils import (
+    DEFAULT_PROFILE,
+    RENDER_PROFILES,
+    get_render_profile,
+    output_suffixes,
+    set_render_profile,
+)
+from src.sync import sync_directory
+from src.validation import cached_validation
 
 
 def write_manifest(entries, output_dir):
     manifest_path = output_dir / "manifest.csv"
-    fieldnames = ["filename", "title", "datasets", "filters", "generated_at"]
+    fieldnames = [
+        "filename",
+        "title",
+        "datasets",
+        "filters",
+        "generated_at",
+        "profile",
+        "formats",
+        "render_seconds",
+        "bytes",
+    ]
     with open(manifest_path, "w", encoding="utf-8", newline="") as handle:
         writer = csv.DictWriter(handle, fieldnames=fieldnames)
         writer.writeheader()
@@ -21,79 +54,204 @@ def write_manifest(entries, output_dir):
 
 def copy_to_docs(output_dir):
     docs_dir = Path(__file__).resolve().parent / "docs" / "figures"
-    docs_dir.mkdir(parents=True, exist_ok=True)
-    for path in output_dir.glob("*.png"):
-        shutil.copy2(path, docs_dir / path.name)
-    manifest = output_dir / "manifest.csv"
-    if manifest.exists():
-        shutil.copy2(manifest, docs_dir / manifest.name)
-
+    patterns = [f"*{suffix}" for suffix in output_suffixes()] + ["manifest.csv"]
+    return sync_directory(output_dir, docs_dir, patterns)
 
-def main():
-    base_dir = Path(__file__).resolve().parent
-    output_dir = base_dir / "outputs" / "figures"
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    race_details = load_csv(
-        "race_details.csv",
-        required_cols=["Pos", "Driver", "Car", "Year", "Grand Prix"],
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline de figuras F1")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(RENDER_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="Perfil de render: draft (rapido), publication (300 dpi) o web (WebP/SVG)",
     )
-    driver_standings = load_csv(
-        "driver_standings.csv",
-        required_cols=["Pos", "Driver", "Year", "PTS"],
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Vigila los CSV y regenera solo los bloques afectados por cada cambio",
     )
-    constructor_standings = load_csv(
-        "constructor_standings.csv",
-        required_cols=["Pos", "Team", "Year"],
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        help="Segundos entre comprobaciones en modo --watch",
     )
-    starting_grids = load_csv(
-        "starting_grids.csv",
-        required_cols=["Pos", "Driver", "Year", "Grand Prix"],
+    parser.add_argument(
+        "--ingest",
+        metavar="DIR",
+        help=(
+            "Anexa los CSV de DIR (mismo nombre que los del repositorio) y "
+            "actualiza solo las temporadas afectadas del estado incremental"
+        ),
     )
-    pitstops = load_csv(
-        "pitstops.csv",
-        required_cols=["Driver", "Year", "Grand Prix"],
+    parser.add_argument(
+        "--pit-percentile",
+        type=float,
+        default=DEFAULT_PIT_PERCENTILE,
+        help="Percentil por temporada que marca una parada como grave en B3_03 (0-1)",
     )
-    sprint_results = load_csv(
-        "sprint_results.csv",
-        required_cols=["Pos", "Driver", "Year", "Grand Prix", "PTS"],
+    parser.add_argument(
+        "--multiples",
+        action="store_true",
+        help=(
+            "Genera tambien las variantes por temporada (B2_02) y por equipo "
+            "(B3_01) en outputs/multiples"
+        ),
     )
-    sprint_grid = load_csv(
-        "sprint_grid.csv",
-        required_cols=["Pos", "Driver", "Year", "Grand Prix"],
+    parser.add_argument(
+        "--backend",
+        choices=["csv", "sqlite"],
+        default="csv",
+        help="Origen de los datos: los CSV o la base SQLite de outputs/f1.sqlite",
     )
-
-    manifest = []
-    manifest.append(plot_b1_01(race_details, output_dir))
-    manifest.append(plot_b1_02(race_details, output_dir))
-    manifest.extend(plot_b1_03(driver_standings, constructor_standings, output_dir))
-
-    manifest.append(plot_b2_01(race_details, starting_grids, output_dir))
-    manifest.append(plot_b2_02(race_details, starting_grids, output_dir))
-    manifest.append(plot_b2_03(race_details, starting_grids, output_dir))
-
-    manifest.append(plot_b3_01(pitstops, race_details, output_dir))
-    manifest.append(plot_b3_02(pitstops, race_details, output_dir))
-    manifest.append(plot_b3_03(pitstops, output_dir))
-
-    manifest.append(plot_b4_01(sprint_results, driver_standings, output_dir))
-    manifest.append(plot_b4_02(sprint_results, sprint_grid, starting_grids, output_dir))
-    manifest.append(plot_b4_03(race_details, sprint_results, output_dir))
-    manifest.append(plot_b4_04(sprint_results, driver_standings, output_dir))
-
-    write_manifest(manifest, output_dir)
-    copy_to_docs(output_dir)
-
-    export_interactive_data(
-        race_details,
-        driver_standings,
-        constructor_standings,
-        starting_grids,
-        pitstops,
-        sprint_results,
-        sprint_grid,
-        base_dir / "docs",
+    parser.add_argument(
+        "--import-sqlite",
+        action="store_true",
+        help="Importa todos los CSV a outputs/f1.sqlite (tablas tipadas e indexadas)",
+    )
+    parser.add_argument(
+        "--benchmark-sqlite",
+        action="store_true",
+        help="Compara la lectura de CSV con las consultas indexadas en SQLite",
     )
+    return parser.parse_args(argv)
+
+
+def publish(manifest_by_stage, output_dir):
+    write_manifest(collect_manifest(manifest_by_stage), output_dir)
+    if RENDER_PROFILES[get_render_profile()]["publish"]:
+        copy_to_docs(output_dir)
+    write_data_pack(Path(__file__).resolve().parent / "docs")
+
+
+# Espera maxima entre reintentos de un cambio que falla en modo --watch.
+MAX_RETRY_DELAY = 300
+
+
+def watch(frames, manifest_by_stage, base_dir, output_dir, interval, backend="csv"):
+    fingerprints = {name: fingerprint(name) for name in DATASETS}
+    print(f"Vigilando {len(DATASETS)} CSV (Ctrl+C para salir)")
+    # pending: datasets ya cargados cuya regeneracion ha fallado. Un CSV que
+    # no se puede cargar conserva su huella anterior. Tras un fallo no se
+    # reintenta en cada vuelta: se espera el siguiente cambio de algun CSV o,
+    # si no llega, un plazo que se duplica con cada fallo (hasta
+    # MAX_RETRY_DELAY).
+    pending = set()
+    failed = None
+    delay = 0.0
+    retry_at = 0.0
+    try:
+        while True:
+            time.sleep(interval)
+            current = {}
+            for name in DATASETS:
+                try:
+                    value = fingerprint(name)
+                except FileNotFoundError:
+                    continue
+                if value != fingerprints[name]:
+                    current[name] = value
+            changed = set(current) | pending
+            if not changed:
+                continue
+            if failed == current and time.monotonic() < retry_at:
+                continue
+
+            try:
+                if current:
+                    load_frames(set(current), frames, backend)
+                fingerprints.update(current)
+                pending = set(changed)
+                changed |= refresh_derived(frames, changed, base_dir)
+                stages = affected_stages(changed)
+                start = time.perf_counter()
+                run_stages(stages, frames, output_dir, base_dir / "docs", manifest_by_stage)
+                publish(manifest_by_stage, output_dir)
+            except Exception as exc:
+                # Huellas que veria la siguiente vuelta si nada cambia.
+                failed = {
+                    name: value
+                    for name, value in current.items()
+                    if fingerprints[name] != value
+                }
+                delay = min(delay * 2, MAX_RETRY_DELAY) if delay else interval
+                retry_at = time.monotonic() + delay
+                print(
+                    f"Cambio no aplicado ({', '.join(sorted(changed))}: {exc}); "
+                    f"se reintentara en {delay:.1f}s o con el siguiente cambio"
+                )
+                continue
+            pending = set()
+            failed = None
+            delay = 0.0
+            elapsed = time.perf_counter() - start
+            print(
+                f"{', '.join(sorted(changed))} -> {', '.join(stages)} "
+                f"({elapsed:.1f}s)"
+            )
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Con Copy-on-Write las copias superficiales (own) comparten los datos de
+    # las columnas hasta que se modifican; pandas >= 3 lo activa siempre.
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+    set_render_profile(args.profile)
+    set_pit_percentile(args.pit_percentile)
+
+    base_dir = Path(__file__).resolve().parent
+    output_dir = base_dir / "outputs" / RENDER_PROFILES[args.profile]["directory"]
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.ingest:
+        start = time.perf_counter()
+        state, years = ingest_directory(
+            args.ingest,
+            base_dir / "outputs" / "incremental_state.pkl",
+            percentile=get_pit_percentile(),
+        )
+        docs_dir = base_dir / "docs"
+        export_incremental_data(state, docs_dir)
+        write_data_pack(docs_dir)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Temporadas actualizadas: {', '.join(map(str, years))} ({elapsed:.0f} ms)")
+        return
+
+    if args.import_sqlite:
+        start = time.perf_counter()
+        rows = import_csvs()
+        elapsed = time.perf_counter() - start
+        print(f"{len(rows)} tablas ({sum(rows.values())} filas) en {DB_PATH} ({elapsed:.1f}s)")
+        return
+
+    if args.benchmark_sqlite:
+        print(benchmark(DATASETS).to_string(index=False, float_format="{:.4f}".format))
+        return
+
+    frames = load_frames(DATASETS, backend=args.backend)
+    report_path = base_dir / "outputs" / "validation_report.json"
+    _, regenerated = cached_validation(frames, DATASETS, report_path)
+    if regenerated:
+        print(f"Informe de calidad de datos actualizado: {report_path}")
+    refresh_derived(frames, set(DATASETS), base_dir)
+
+    manifest_by_stage = run_stages(STAGES, frames, output_dir, base_dir / "docs", {})
+    publish(manifest_by_stage, output_dir)
+
+    if args.multiples:
+        multiples = run_multiples(frames, base_dir / "outputs" / "multiples")
+        for name, stats in multiples.items():
+            print(
+                f"{name}: {stats['images']} imagenes en {stats['seconds']:.1f}s "
+                f"({stats['images_per_second']:.1f} img/s)"
+            )
+
+    if args.watch:
+        watch(frames, manifest_by_stage, base_dir, output_dir, args.interval, args.backend)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+﻿from pathlib import Path
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import to_numeric
+from src.interactive_data import _write_json
+
+
+class CareerIndex:
+    # Filas de driver_details ordenadas por (Driver, Date) con un rango
+    # [start, end) por piloto. Las consultas usan sumas prefijas, busqueda
+    # binaria sobre las fechas del piloto y posiciones precalculadas.
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        drivers = self.frame["Driver"].to_numpy()
+        boundaries = np.flatnonzero(np.r_[True, drivers[1:] != drivers[:-1]])
+        self.drivers = drivers[boundaries]
+        self.starts = boundaries
+        self.ends = np.r_[boundaries[1:], len(drivers)]
+        self._position = {name: i for i, name in enumerate(self.drivers)}
+
+        self.dates = self.frame["Date"].to_numpy(dtype="datetime64[D]")
+        points = self.frame["PTS"].to_numpy(dtype=float)
+        self.points_prefix = np.r_[0.0, np.cumsum(points)]
+
+        wins = (self.frame["FinishPos"] == 1).to_numpy()
+        win_prefix = np.r_[0, np.cumsum(wins)]
+        self.win_count = win_prefix[self.ends] - win_prefix[self.starts]
+        win_rows = np.flatnonzero(wins)
+        first = np.searchsorted(win_rows, self.starts)
+        last = np.searchsorted(win_rows, self.ends) - 1
+        has_win = self.win_count > 0
+        self.first_win = np.where(has_win, win_rows[np.minimum(first, len(win_rows) - 1)], -1)
+        self.last_win = np.where(has_win, win_rows[np.maximum(last, 0)], -1)
+
+        cars = self.frame["Car"].to_numpy()
+        changed = np.r_[True, cars[1:] != cars[:-1]]
+        changed[self.starts] = True
+        self.team_starts = np.flatnonzero(changed)
+
+    @classmethod
+    def from_driver_details(cls, driver_details):
+        df = driver_details[["Driver", "Car", "Date", "Grand Prix", "PTS", "Race Position"]].copy()
+        df["Date"] = pd.to_datetime(df["Date"], format="%d %b %Y", errors="coerce")
+        df["Car"] = df["Car"].fillna("")
+        df["PTS"] = to_numeric(df["PTS"]).fillna(0)
+        df["FinishPos"] = to_numeric(df["Race Position"])
+        df = df.dropna(subset=["Driver", "Date"])
+        df = df.sort_values(["Driver", "Date"], kind="stable")
+        return cls(df)
+
+    def _range(self, driver):
+        if driver not in self._position:
+            raise KeyError(f"Piloto desconocido en driver_details.csv: {driver}")
+        i = self._position[driver]
+        return i, self.starts[i], self.ends[i]
+
+    def _until(self, start, end, date):
+        if date is None:
+            return end
+        day = np.datetime64(pd.Timestamp(date).date(), "D")
+        return start + np.searchsorted(self.dates[start:end], day, side="right")
+
+    def starts_count(self, driver):
+        _, start, end = self._range(driver)
+        return int(end - start)
+
+    def cumulative_points(self, driver, date=None):
+        _, start, end = self._range(driver)
+        stop = self._until(start, end, date)
+        return float(self.points_prefix[stop] - self.points_prefix[start])
+
+    def rolling_form(self, driver, window=5, date=None):
+        _, start, end = self._range(driver)
+        stop = self._until(start, end, date)
+        first = max(start, stop - window)
+        if stop == first:
+            return float("nan")
+        return float((self.points_prefix[stop] - self.points_prefix[first]) / (stop - first))
+
+    def team_changes(self, driver):
+        _, start, end = self._range(driver)
+        lo, hi = np.searchsorted(self.team_starts, [start, end])
+        rows = self.frame.loc[self.team_starts[lo:hi]]
+        return [
+            {"date": date.strftime("%Y-%m-%d"), "car": car, "grand_prix": grand_prix}
+            for date, car, grand_prix in zip(rows["Date"], rows["Car"], rows["Grand Prix"])
+        ]
+
+    def first_last_win(self, driver):
+        i, _, _ = self._range(driver)
+        result = {"wins": int(self.win_count[i]), "first": None, "last": None}
+        for key, row in (("first", self.first_win[i]), ("last", self.last_win[i])):
+            if row >= 0:
+                result[key] = {
+                    "date": self.frame.at[row, "Date"].strftime("%Y-%m-%d"),
+                    "grand_prix": self.frame.at[row, "Grand Prix"],
+                    "car": self.frame.at[row, "Car"],
+                }
+        return result
+
+    def timeline(self, driver, window=5):
+        _, start, end = self._range(driver)
+        points = self.points_prefix[start + 1:end + 1] - self.points_prefix[start]
+        prefix = self.points_prefix[start:end + 1]
+        idx = np.arange(1, end - start + 1)
+        lower = np.maximum(idx - window, 0)
+        form = (prefix[idx] - prefix[lower]) / (idx - lower)
+        rows = self.frame.iloc[start:end]
+        return {
+            "driver": driver,
+            "dates": rows["Date"].dt.strftime("%Y-%m-%d").tolist(),
+            "grand_prix": rows["Grand Prix"].tolist(),
+            "cars": rows["Car"].tolist(),
+            "cumulative_points": points.tolist(),
+            "rolling_form": form.tolist(),
+            "form_window": window,
+            "team_changes": self.team_changes(driver),
+            "wins": self.first_last_win(driver),
+        }
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def export_driver_careers(index, output_dir, window=5):
+    careers_dir = Path(output_dir) / "data" / "careers"
+    filenames = {driver: f"{_slug(driver)}.json" for driver in index.drivers}
+    # Se borran antes los JSON de pilotos que ya no estan en driver_details.
+    if careers_dir.exists():
+        current = set(filenames.values())
+        for path in careers_dir.glob("*.json"):
+            if path.name not in current:
+                path.unlink()
+    entries = []
+    for driver, filename in filenames.items():
+        _write_json(careers_dir / filename, index.timeline(driver, window))
+        entries.append(
+            {
+                "driver": driver,
+                "file": f"careers/{filename}",
+                "starts": index.starts_count(driver),
+                "points": index.cumulative_points(driver),
+            }
+        )
+    _write_json(Path(output_dir) / "data" / "careers_index.json", {"drivers": entries})
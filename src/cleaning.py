@@ -2,12 +2,49 @@
 import pandas as pd
 
 
+_TIME_PATTERN = r"^\s*\+?(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?)s?\s*$"
+
+
 def to_numeric(series):
     return pd.to_numeric(series, errors="coerce")
 
 
+def parse_time(series):
+    # Acepta m:ss.sss, h:mm:ss.sss, segundos sueltos y gaps "+1.234s";
+    # se parsea cada valor distinto una sola vez y se reexpande con los codigos.
+    series = pd.Series(series)
+    if pd.api.types.is_numeric_dtype(series):
+        return to_numeric(series).astype(float)
+    codes, uniques = pd.factorize(series.astype("string"))
+    parts = pd.Series(np.asarray(uniques, dtype=object)).str.extract(_TIME_PATTERN)
+    parts = parts.apply(to_numeric)
+    seconds = (
+        parts[0].fillna(0) * 3600 + parts[1].fillna(0) * 60 + parts[2]
+    ).to_numpy(dtype=float)
+    values = np.full(len(codes), np.nan)
+    valid = codes >= 0
+    values[valid] = seconds[codes[valid]]
+    return pd.Series(values, index=series.index)
+
+
+def _copy_on_write():
+    # pandas >= 3 siempre; en pandas 2 solo si alguien lo ha activado (main).
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def own(df):
+    # Marco propio: anadir o reasignar columnas no toca el original. Con
+    # Copy-on-Write basta una copia superficial (solo se materializan las
+    # columnas nuevas); sin el, la copia tiene que ser completa.
+    if _copy_on_write():
+        return df.copy(deep=False)
+    return df.copy()
+
+
 def add_decade(df, year_col="Year"):
-    df = df.copy()
+    df = own(df)
     df[year_col] = to_numeric(df[year_col])
     df = df.dropna(subset=[year_col])
     df[year_col] = df[year_col].astype(int)
@@ -16,7 +53,7 @@ def add_decade(df, year_col="Year"):
 
 
 def add_driver_key(df):
-    df = df.copy()
+    df = own(df)
     if "DriverCode" in df.columns:
         codes = df["DriverCode"].astype(str).str.strip()
         codes = codes.where(codes != "", np.nan)
@@ -28,17 +65,35 @@ def add_driver_key(df):
 
 
 def add_finish_pos(df, pos_col="Pos"):
-    df = df.copy()
+    df = own(df)
     df["FinishPos"] = to_numeric(df[pos_col])
     return df
 
 
 def add_grid_pos(df, pos_col="Pos"):
-    df = df.copy()
+    df = own(df)
     df["GridPos"] = to_numeric(df[pos_col])
     return df
 
 
+def merge_race_grid(race_details, starting_grids):
+    race = add_driver_key(add_finish_pos(race_details, "Pos"))
+    grid = add_driver_key(add_grid_pos(starting_grids, "Pos"))
+
+    race["Year"] = to_numeric(race["Year"])
+    grid["Year"] = to_numeric(grid["Year"])
+
+    race = race.dropna(subset=["Year", "Grand Prix", "DriverKey"])
+    grid = grid.dropna(subset=["Year", "Grand Prix", "DriverKey"])
+
+    merged = race.merge(
+        grid[["Year", "Grand Prix", "DriverKey", "GridPos"]],
+        on=["Year", "Grand Prix", "DriverKey"],
+        how="inner",
+    )
+    return merged
+
+
 def spearman_corr(x, y):
     x_series = pd.Series(x)
     y_series = pd.Series(y)
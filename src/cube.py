@@ -0,0 +1,136 @@
+﻿from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import add_driver_key, add_finish_pos, add_grid_pos, to_numeric
+
+
+DIMENSIONS = ["Year", "Grand Prix", "Car", "DriverKey"]
+MEASURES = ["starts", "finishes", "wins", "podiums", "points", "poles"]
+
+
+class AggregateCube:
+    # Celdas al nivel mas fino (Year x Grand Prix x Car x DriverKey) con las
+    # dimensiones codificadas como enteros; los roll-ups suman celdas.
+
+    def __init__(self, labels, codes, measures):
+        self.labels = labels
+        self.codes = codes
+        self.measures = measures
+
+    @classmethod
+    def from_frames(cls, race_details, starting_grids):
+        race = add_driver_key(add_finish_pos(race_details, "Pos"))
+        race["Year"] = to_numeric(race["Year"])
+        race["PTS"] = to_numeric(race["PTS"]).fillna(0)
+        race = race.dropna(subset=DIMENSIONS)
+        race["Year"] = race["Year"].astype(int)
+
+        grid = add_driver_key(add_grid_pos(starting_grids, "Pos"))
+        grid["Year"] = to_numeric(grid["Year"])
+        grid = grid.dropna(subset=["Year", "Grand Prix", "DriverKey", "GridPos"])
+        grid = grid.drop_duplicates(["Year", "Grand Prix", "DriverKey"])
+        race = race.merge(
+            grid[["Year", "Grand Prix", "DriverKey", "GridPos"]],
+            on=["Year", "Grand Prix", "DriverKey"],
+            how="left",
+        )
+
+        finish = race["FinishPos"]
+        rows = pd.DataFrame(
+            {
+                "starts": 1,
+                "finishes": finish.notna(),
+                "wins": finish == 1,
+                "podiums": finish <= 3,
+                "points": race["PTS"],
+                "poles": race["GridPos"] == 1,
+            }
+        )
+
+        labels = {}
+        row_codes = []
+        for dim in DIMENSIONS:
+            codes, uniques = pd.factorize(race[dim], sort=True)
+            values = np.asarray(uniques)
+            labels[dim] = values.astype(str) if values.dtype == object else values
+            row_codes.append(codes)
+
+        shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        flat = np.ravel_multi_index(row_codes, shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+        cell_codes = np.unravel_index(cells, shape)
+
+        codes = {
+            dim: cell_codes[i].astype(_code_dtype(shape[i]))
+            for i, dim in enumerate(DIMENSIONS)
+        }
+        measures = {}
+        for name in MEASURES:
+            summed = np.bincount(
+                inverse, weights=rows[name].to_numpy(dtype=float), minlength=len(cells)
+            )
+            dtype = np.float32 if name == "points" else np.int32
+            measures[name] = summed.astype(dtype)
+        return cls(labels, codes, measures)
+
+    def __len__(self):
+        return len(next(iter(self.measures.values())))
+
+    def rollup(self, dims=(), measures=None):
+        dims = list(dims)
+        unknown = [dim for dim in dims if dim not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Dimensiones desconocidas en el cubo: {', '.join(unknown)}")
+        measures = list(MEASURES if measures is None else measures)
+
+        if not dims:
+            return pd.DataFrame(
+                {name: [self.measures[name].sum()] for name in measures}
+            )
+
+        shape = tuple(len(self.labels[dim]) for dim in dims)
+        flat = np.ravel_multi_index([self.codes[dim] for dim in dims], shape)
+        groups, inverse = np.unique(flat, return_inverse=True)
+        group_codes = np.unravel_index(groups, shape)
+
+        data = {
+            dim: self.labels[dim][group_codes[i]] for i, dim in enumerate(dims)
+        }
+        data["cells"] = np.bincount(inverse, minlength=len(groups))
+        for name in measures:
+            summed = np.bincount(
+                inverse, weights=self.measures[name], minlength=len(groups)
+            )
+            data[name] = summed if name == "points" else summed.astype(np.int64)
+        return pd.DataFrame(data)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for dim in DIMENSIONS:
+            arrays[f"labels__{dim}"] = self.labels[dim]
+            arrays[f"codes__{dim}"] = self.codes[dim]
+        for name, values in self.measures.items():
+            arrays[f"measure__{name}"] = values
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            labels = {dim: archive[f"labels__{dim}"] for dim in DIMENSIONS}
+            codes = {dim: archive[f"codes__{dim}"] for dim in DIMENSIONS}
+            measures = {
+                key.split("__", 1)[1]: archive[key]
+                for key in archive.files
+                if key.startswith("measure__")
+            }
+        return cls(labels, codes, measures)
+
+
+def _code_dtype(size):
+    if size <= np.iinfo(np.int16).max:
+        return np.int16
+    return np.int32
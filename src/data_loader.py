@@ -1,6 +1,15 @@
-﻿from pathlib import Path
+﻿from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import datetime
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    _HAS_PYARROW = True
+except Exception:
+    _HAS_PYARROW = False
+
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
@@ -9,12 +18,65 @@ def load_csv(filename, required_cols=None):
     path = BASE_DIR / filename
     if not path.exists():
         raise FileNotFoundError(f"No se encuentra el archivo: {path}")
-    df = pd.read_csv(path)
+    df = _read_csv(path)
     if required_cols:
         validate_columns(df, required_cols, filename)
     return df
 
 
+def _is_temporal(series):
+    if series.dtype.kind in "mM":
+        return True
+    if series.dtype != object:
+        return False
+    first = series.first_valid_index()
+    return first is not None and isinstance(
+        series[first], (datetime.date, datetime.time)
+    )
+
+
+def _read_csv(path):
+    if not _HAS_PYARROW:
+        return pd.read_csv(path)
+    # El motor pyarrow lee con varios hilos, pero infiere horas/fechas que el
+    # motor C deja como texto. Esas columnas se sacan del esquema del primer
+    # bloque y se piden como str, asi que el archivo se lee una sola vez.
+    with pa_csv.open_csv(path) as reader:
+        temporal = [
+            field.name for field in reader.schema if pa.types.is_temporal(field.type)
+        ]
+    dtype = {col: "str" for col in temporal}
+    df = pd.read_csv(path, engine="pyarrow", dtype=dtype or None)
+    # Una columna que solo parece hora/fecha despues del primer bloque obliga
+    # a releer.
+    late = [col for col in df.columns if col not in dtype and _is_temporal(df[col])]
+    if late:
+        dtype.update({col: "str" for col in late})
+        df = pd.read_csv(path, engine="pyarrow", dtype=dtype)
+    return df
+
+
+def load_csvs(specs, max_workers=None):
+    # specs: {nombre: (filename, required_cols)}. Lee todos los CSV a la vez
+    # en un pool de hilos y valida las columnas igual que load_csv.
+    paths = {}
+    for name, (filename, _) in specs.items():
+        path = BASE_DIR / filename
+        if not path.exists():
+            raise FileNotFoundError(f"No se encuentra el archivo: {path}")
+        paths[name] = path
+    if not paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(paths)) as pool:
+        futures = {name: pool.submit(_read_csv, path) for name, path in paths.items()}
+        frames = {name: future.result() for name, future in futures.items()}
+    for name, (filename, required_cols) in specs.items():
+        if required_cols:
+            validate_columns(frames[name], required_cols, filename)
+    return frames
+
+
 def validate_columns(df, required_cols, filename):
     missing = [col for col in required_cols if col not in df.columns]
     if missing:
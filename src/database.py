@@ -0,0 +1,234 @@
+﻿import json
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import BASE_DIR, load_csv, load_csvs, validate_columns
+from src.store import select_years
+
+
+DB_PATH = BASE_DIR / "outputs" / "f1.sqlite"
+META_TABLE = "_datasets"
+# Indices creados en cada tabla que tenga esas columnas.
+INDEXES = [("Year", "Grand Prix"), ("DriverCode",), ("Car",)]
+SQL_TYPES = {"i": "INTEGER", "u": "INTEGER", "b": "INTEGER", "f": "REAL"}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _fingerprint(filename):
+    stat = (BASE_DIR / filename).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _connect(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {META_TABLE} ("
+        "name TEXT PRIMARY KEY, source TEXT, fingerprint TEXT, dtypes TEXT, "
+        "years TEXT, rows INTEGER)"
+    )
+    return con
+
+
+def _import_frame(con, name, filename, df):
+    table = _quote(name)
+    columns = ", ".join(
+        f"{_quote(col)} {SQL_TYPES.get(dtype.kind, 'TEXT')}"
+        for col, dtype in df.dtypes.items()
+    )
+    rows = df.astype(object)
+    rows = rows.where(rows.notna(), None).itertuples(index=False, name=None)
+    placeholders = ", ".join("?" * len(df.columns))
+    meta = (
+        name,
+        filename,
+        json.dumps(_fingerprint(filename)),
+        json.dumps({col: str(dtype) for col, dtype in df.dtypes.items()}),
+        json.dumps(sorted(int(year) for year in df["Year"].dropna().unique())),
+        len(df),
+    )
+
+    # Una transaccion por tabla: borrado, carga masiva, indices y metadatos.
+    with con:
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+        con.execute(f"CREATE TABLE {table} ({columns})")
+        con.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+        for index in INDEXES:
+            if all(col in df.columns for col in index):
+                index_name = _quote(f"idx_{name}_{'_'.join(index)}".replace(" ", "_"))
+                cols = ", ".join(_quote(col) for col in index)
+                con.execute(f"CREATE INDEX {index_name} ON {table} ({cols})")
+        con.execute(f"INSERT OR REPLACE INTO {META_TABLE} VALUES (?, ?, ?, ?, ?, ?)", meta)
+
+
+def import_csvs(names=None, path=DB_PATH):
+    # Importa cada CSV (por defecto todos los del repositorio) a una tabla
+    # con el mismo nombre y columnas tipadas a partir de la lectura de pandas.
+    if names is None:
+        names = [csv_path.stem for csv_path in sorted(BASE_DIR.glob("*.csv"))]
+    frames = load_csvs({name: (f"{name}.csv", ["Year"]) for name in names})
+    con = _connect(path)
+    try:
+        con.execute("PRAGMA synchronous = OFF")
+        for name, df in frames.items():
+            _import_frame(con, name, f"{name}.csv", df)
+    finally:
+        con.close()
+    return {name: len(df) for name, df in frames.items()}
+
+
+def _meta(con):
+    rows = con.execute(f"SELECT name, source, fingerprint, dtypes, years FROM {META_TABLE}")
+    return {
+        name: {
+            "source": source,
+            "fingerprint": json.loads(fingerprint),
+            "dtypes": json.loads(dtypes),
+            "years": json.loads(years),
+        }
+        for name, source, fingerprint, dtypes, years in rows
+    }
+
+
+def stale_tables(names, path=DB_PATH):
+    # Tablas que faltan o cuyo CSV ha cambiado desde la importacion.
+    if not path.exists():
+        return list(names)
+    con = _connect(path)
+    try:
+        meta = _meta(con)
+    finally:
+        con.close()
+    return [
+        name
+        for name in names
+        if name not in meta or meta[name]["fingerprint"] != _fingerprint(meta[name]["source"])
+    ]
+
+
+def _query(con, name, meta, columns=None, years=None, filters=None):
+    info = meta.get(name)
+    if info is None:
+        raise ValueError(f"La tabla {name} no esta importada en la base de datos")
+    dtypes = info["dtypes"]
+    columns = list(dtypes) if columns is None else list(columns)
+    validate_columns(pd.DataFrame(columns=list(dtypes)), columns, info["source"])
+
+    # filters: {columna: valor o lista de valores}; years admite lo mismo
+    # que load_dataset y se traduce a un IN sobre el indice (Year, Grand Prix).
+    filters = dict(filters or {})
+    if years is not None:
+        filters["Year"] = select_years(info["years"], years)
+    clauses = []
+    params = []
+    for col, values in filters.items():
+        validate_columns(pd.DataFrame(columns=list(dtypes)), [col], info["source"])
+        if isinstance(values, (str, int, float, np.generic)):
+            values = [values]
+        # sqlite3 no enlaza escalares de numpy (np.int64 de un DataFrame).
+        values = [value.item() if isinstance(value, np.generic) else value for value in values]
+        if not values:
+            clauses.append("0")
+            continue
+        clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    select = ", ".join(_quote(col) for col in columns)
+    sql = f"SELECT {select} FROM {_quote(name)}{where} ORDER BY rowid"
+
+    df = pd.read_sql_query(sql, con, params=params)
+    return df.astype({col: dtypes[col] for col in columns})
+
+
+def load_table(name, columns=None, years=None, filters=None, path=DB_PATH):
+    # Mismas filas, orden y dtypes que load_csv (filtradas si se pide).
+    con = _connect(path)
+    try:
+        return _query(con, name, _meta(con), columns, years, filters)
+    finally:
+        con.close()
+
+
+def load_tables(specs, path=DB_PATH):
+    # specs: {nombre: (filename, required_cols)}, como load_csvs. Reimporta
+    # antes las tablas desactualizadas.
+    stale = stale_tables(specs, path)
+    if stale:
+        import_csvs(stale, path)
+    con = _connect(path)
+    try:
+        meta = _meta(con)
+        frames = {name: _query(con, name, meta) for name in specs}
+    finally:
+        con.close()
+    for name, (filename, required_cols) in specs.items():
+        if required_cols:
+            validate_columns(frames[name], required_cols, filename)
+    return frames
+
+
+def _timed(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(specs, path=DB_PATH, repeat=5):
+    # Compara leer el CSV y filtrar en pandas con la consulta indexada para
+    # los accesos del pipeline: todo, la era sprint, una carrera, un equipo
+    # y un piloto.
+    if stale_tables(specs, path):
+        import_csvs(list(specs), path)
+    race = load_csv("race_details.csv")
+    last = race.iloc[-1]
+    patterns = {
+        "todos los datasets": (
+            lambda: load_csvs(specs),
+            lambda: load_tables(specs, path),
+        ),
+        "race_details 2021+": (
+            lambda: _filter_csv("race_details", {"Year": lambda year: year >= 2021}),
+            lambda: load_table("race_details", years=lambda year: year >= 2021, path=path),
+        ),
+        "race_details una carrera": (
+            lambda: _filter_csv(
+                "race_details", {"Year": [last["Year"]], "Grand Prix": [last["Grand Prix"]]}
+            ),
+            lambda: load_table(
+                "race_details",
+                filters={"Year": int(last["Year"]), "Grand Prix": last["Grand Prix"]},
+                path=path,
+            ),
+        ),
+        "race_details Car=Ferrari": (
+            lambda: _filter_csv("race_details", {"Car": ["Ferrari"]}),
+            lambda: load_table("race_details", filters={"Car": "Ferrari"}, path=path),
+        ),
+        "race_details DriverCode=HAM": (
+            lambda: _filter_csv("race_details", {"DriverCode": ["HAM"]}),
+            lambda: load_table("race_details", filters={"DriverCode": "HAM"}, path=path),
+        ),
+    }
+    rows = []
+    for label, (csv_func, sql_func) in patterns.items():
+        csv_seconds = _timed(csv_func, repeat)
+        sql_seconds = _timed(sql_func, repeat)
+        rows.append((label, csv_seconds, sql_seconds, csv_seconds / sql_seconds))
+    return pd.DataFrame(rows, columns=["acceso", "csv_s", "sqlite_s", "speedup"])
+
+
+def _filter_csv(name, filters):
+    # filters: {columna: lista de valores o funcion sobre la columna}.
+    df = load_csv(f"{name}.csv")
+    mask = pd.Series(True, index=df.index)
+    for col, values in filters.items():
+        mask &= values(df[col]) if callable(values) else df[col].isin(values)
+    return df[mask].reset_index(drop=True)
@@ -0,0 +1,380 @@
+﻿from pathlib import Path
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import add_driver_key, own, spearman_corr, to_numeric
+from src.data_loader import BASE_DIR
+from src.stats import bootstrap_spearman
+
+try:
+    from scipy.stats import spearmanr
+    _HAS_SCIPY = True
+except Exception:
+    _HAS_SCIPY = False
+
+
+INGEST_DATASETS = {
+    "race_details": "race_details.csv",
+    "starting_grids": "starting_grids.csv",
+    "pitstops": "pitstops.csv",
+    "driver_standings": "driver_standings.csv",
+    "constructor_standings": "constructor_standings.csv",
+}
+
+STANDINGS = ("driver_standings", "constructor_standings")
+# Cambia si cambia la estructura del estado; un estado antiguo se reconstruye.
+STATE_VERSION = 3
+
+SLIM_COLUMNS = {
+    "race_details": ["Year", "Grand Prix", "Car", "DriverKey", "FinishPos"],
+    "starting_grids": ["Year", "Grand Prix", "DriverKey", "GridPos"],
+    "pitstops": ["Year", "Grand Prix", "PitTime"],
+    "driver_standings": ["Year", "Entity", "PosNum"],
+    "constructor_standings": ["Year", "Entity", "PosNum"],
+}
+
+
+def _slim(name, df):
+    # Solo las columnas que necesitan los agregados, con Year entero.
+    df = own(df)
+    df["Year"] = to_numeric(df["Year"])
+    df = df.dropna(subset=["Year"])
+    df["Year"] = df["Year"].astype(int)
+    if name == "race_details":
+        df = add_driver_key(df)
+        df["FinishPos"] = to_numeric(df["Pos"])
+        return df[SLIM_COLUMNS[name]]
+    if name == "starting_grids":
+        df = add_driver_key(df)
+        df["GridPos"] = to_numeric(df["Pos"])
+        return df[SLIM_COLUMNS[name]]
+    if name == "pitstops":
+        time_col = "Time" if "Time" in df.columns else "Total"
+        df["PitTime"] = to_numeric(df[time_col])
+        return df.dropna(subset=["PitTime"])[SLIM_COLUMNS[name]]
+    entity = "Driver" if name == "driver_standings" else "Team"
+    df["PosNum"] = to_numeric(df["Pos"])
+    return df.rename(columns={entity: "Entity"})[SLIM_COLUMNS[name]]
+
+
+def _spearman(x, y):
+    if _HAS_SCIPY:
+        value, _ = spearmanr(x, y, nan_policy="omit")
+        return value
+    return spearman_corr(x, y)
+
+
+def _partition(state, name, year):
+    part = state["partitions"][name].get(year)
+    if part is None:
+        return pd.DataFrame(columns=SLIM_COLUMNS[name])
+    return part
+
+
+def _update_year(state, year):
+    agg = state["aggregates"]
+    race = _partition(state, "race_details", year)
+
+    # B1_01: victorias por equipo y carreras del año
+    with_car = race.dropna(subset=["Grand Prix", "Car"])
+    wins = with_car[with_car["FinishPos"] == 1].groupby("Car").size()
+    races = with_car["Grand Prix"].nunique()
+    agg["wins"][year] = wins
+    agg["dominant_pct"][year] = (
+        float(wins.max() / races * 100) if races and not wins.empty else np.nan
+    )
+
+    # B2_01: Spearman grid vs posicion final
+    grid = _partition(state, "starting_grids", year)
+    agg["rho"][year] = np.nan
+    if not race.empty and not grid.empty:
+        merged = race.dropna(subset=["Grand Prix", "DriverKey"]).merge(
+            grid.dropna(subset=["Grand Prix", "DriverKey"]),
+            on=["Year", "Grand Prix", "DriverKey"],
+            how="inner",
+        )
+        merged = merged.dropna(subset=["FinishPos", "GridPos"])
+        if len(merged) > 1:
+            agg["rho"][year] = float(_spearman(merged["GridPos"], merged["FinishPos"]))
+
+    # B3_03: umbral del percentil de la temporada y paradas graves
+    pit = _partition(state, "pitstops", year)["PitTime"].astype(float)
+    if pit.empty:
+        agg["threshold"].pop(year, None)
+        agg["severe"].pop(year, None)
+    else:
+        threshold = float(pit.quantile(state["percentile"]))
+        agg["threshold"][year] = threshold
+        agg["severe"][year] = pit[pit > threshold].to_numpy()
+
+    # B1_03: campeones de la temporada
+    for name, key in [
+        ("driver_standings", "driver_champions"),
+        ("constructor_standings", "team_champions"),
+    ]:
+        standings = _partition(state, name, year)
+        agg[key][year] = standings.loc[standings["PosNum"] == 1, "Entity"].tolist()
+
+
+def _update_decade(state, decade):
+    agg = state["aggregates"]
+    parts = [
+        wins for year, wins in agg["wins"].items() if (year // 10) * 10 == decade
+    ]
+    if parts:
+        agg["decade_wins"][decade] = pd.concat(parts).groupby(level=0).sum()
+    else:
+        agg["decade_wins"].pop(decade, None)
+
+
+def _update_bands(state, years):
+    # IC bootstrap de B2_01 de las temporadas afectadas; la semilla de cada
+    # una depende solo de su año, igual que en la ejecucion completa.
+    race, grid = [
+        pd.concat(
+            [_partition(state, name, year) for year in sorted(years)], ignore_index=True
+        )
+        for name in ("race_details", "starting_grids")
+    ]
+    merged = race.dropna(subset=["Grand Prix", "DriverKey"]).merge(
+        grid.dropna(subset=["Grand Prix", "DriverKey"]),
+        on=["Year", "Grand Prix", "DriverKey"],
+        how="inner",
+    )
+    merged = merged.dropna(subset=["Grand Prix", "DriverKey", "FinishPos", "GridPos"])
+    # Una sola temporada no compensa arrancar un pool de procesos.
+    bands = bootstrap_spearman(
+        merged,
+        "Year",
+        "Grand Prix",
+        "GridPos",
+        "FinishPos",
+        seed=2024,
+        workers=None if len(years) > 1 else 1,
+    )
+    agg = state["aggregates"]["bands"]
+    for year in years:
+        agg.pop(year, None)
+    agg.update(
+        {int(year): (low, high) for year, low, high in bands.itertuples(index=False)}
+    )
+
+
+def _refresh(state, years):
+    for year in sorted(years):
+        _update_year(state, year)
+    for decade in sorted({(year // 10) * 10 for year in years}):
+        _update_decade(state, decade)
+    if years:
+        _update_bands(state, years)
+
+
+def build_state(frames, percentile=0.95):
+    state = {
+        "version": STATE_VERSION,
+        "percentile": percentile,
+        "partitions": {},
+        "aggregates": {
+            "wins": {},
+            "dominant_pct": {},
+            "rho": {},
+            "bands": {},
+            "threshold": {},
+            "severe": {},
+            "driver_champions": {},
+            "team_champions": {},
+            "decade_wins": {},
+        },
+    }
+    years = set()
+    for name in INGEST_DATASETS:
+        slim = _slim(name, frames[name])
+        state["partitions"][name] = {
+            int(year): part for year, part in slim.groupby("Year")
+        }
+        years.update(state["partitions"][name])
+    _refresh(state, years)
+    return state
+
+
+def ingest(state, new_frames):
+    # Upsert: las carreras (Year, Grand Prix) recibidas sustituyen a las que
+    # ya hubiera y la clasificacion de una temporada sustituye a la anterior.
+    years = set()
+    for name, rows in new_frames.items():
+        if name not in INGEST_DATASETS or rows is None or rows.empty:
+            continue
+        slim = _slim(name, rows)
+        partitions = state["partitions"][name]
+        for year, part in slim.groupby("Year"):
+            year = int(year)
+            if name in STANDINGS or year not in partitions:
+                partitions[year] = part
+            else:
+                kept = partitions[year]
+                kept = kept[~kept["Grand Prix"].isin(part["Grand Prix"].unique())]
+                partitions[year] = pd.concat([kept, part], ignore_index=True)
+            years.add(year)
+    _refresh(state, years)
+    return sorted(years)
+
+
+def _upsert_keys(name, years, grands_prix):
+    # Clave de upsert de cada fila: temporada en las clasificaciones y
+    # (temporada, carrera) en el resto. El año se parsea de una vez; las
+    # filas sin año llevan -1 y nunca coinciden con una clave recibida.
+    years = to_numeric(pd.Series(list(years), dtype=object)).fillna(-1).astype(int)
+    if name in STANDINGS:
+        return pd.Index(years)
+    return pd.MultiIndex.from_arrays([years, list(grands_prix)])
+
+
+def upsert_rows(name, rows, base_dir=BASE_DIR):
+    # Reescribe el CSV sin las filas de las claves recibidas e inserta las
+    # nuevas donde estaba la primera de ellas (al final si son nuevas). El
+    # resto de lineas se copia tal cual, asi que repetir la ingesta no cambia
+    # el archivo.
+    path = Path(base_dir) / INGEST_DATASETS[name]
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        lines = handle.readlines()
+    header = next(csv.reader(lines[:1]))
+    missing = [col for col in header if col not in rows.columns]
+    if missing:
+        raise ValueError(
+            f"Faltan columnas para anexar a {path.name}: {', '.join(missing)}"
+        )
+    year_col = header.index("Year")
+    gp_col = header.index("Grand Prix") if "Grand Prix" in header else None
+    grands_prix = rows["Grand Prix"] if gp_col is not None else [None] * len(rows)
+    keys = _upsert_keys(name, rows["Year"], grands_prix)
+    keys = keys[keys.get_level_values(0) >= 0].unique()
+
+    # Solo se parsean las lineas que contienen el texto de alguna clave (año
+    # y carrera); el resto no puede coincidir y se copia sin tocar.
+    needles = [
+        (str(key[0]), str(key[1])) if gp_col is not None else (str(key), "")
+        for key in keys
+    ]
+    body = lines[1:]
+    candidates = sorted(
+        {
+            i
+            for year, grand_prix in needles
+            for i, line in enumerate(body)
+            if grand_prix in line and year in line
+        }
+    )
+    fields = [
+        row or [None] * len(header) for row in csv.reader([body[i] for i in candidates])
+    ]
+    matched = _upsert_keys(
+        name,
+        [row[year_col] for row in fields],
+        [row[gp_col] for row in fields] if gp_col is not None else [None] * len(fields),
+    ).isin(keys)
+    dropped = {i for i, match in zip(candidates, matched) if match}
+    kept = [line for i, line in enumerate(body) if i not in dropped]
+    insert_at = min(dropped) if dropped else None
+    if kept and not kept[-1].endswith(("\n", "\r")):
+        kept[-1] += "\n"
+    if insert_at is None:
+        insert_at = len(kept)
+    new_lines = rows[header].to_csv(header=False, index=False, lineterminator="\n")
+
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as handle:
+        handle.write(lines[0])
+        handle.writelines(kept[:insert_at])
+        handle.write(new_lines)
+        handle.writelines(kept[insert_at:])
+    os.replace(tmp, path)
+
+
+def save_state(state, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle(state, path)
+
+
+def load_state(path):
+    return pd.read_pickle(path)
+
+
+def ingest_directory(directory, state_path, base_dir=BASE_DIR, percentile=0.95):
+    directory = Path(directory)
+    new_frames = {}
+    for name, filename in INGEST_DATASETS.items():
+        path = directory / filename
+        if path.exists():
+            new_frames[name] = pd.read_csv(path)
+    if not new_frames:
+        raise FileNotFoundError(f"No hay CSV que anexar en {directory}")
+
+    state_path = Path(state_path)
+    state = load_state(state_path) if state_path.exists() else None
+    if state is None or state.get("version") != STATE_VERSION:
+        state = build_state(
+            {
+                name: pd.read_csv(Path(base_dir) / filename)
+                for name, filename in INGEST_DATASETS.items()
+            },
+            percentile,
+        )
+    elif state["percentile"] != percentile:
+        state["percentile"] = percentile
+        for year in state["partitions"]["pitstops"]:
+            _update_year(state, year)
+    for name, rows in new_frames.items():
+        upsert_rows(name, rows, base_dir)
+    years = ingest(state, new_frames)
+    save_state(state, state_path)
+    return state, years
+
+
+def dominant_team_pct(state):
+    pct = pd.Series(state["aggregates"]["dominant_pct"], dtype=float)
+    return pct.dropna().sort_index()
+
+
+def decade_share(state):
+    wins = pd.DataFrame(state["aggregates"]["decade_wins"]).T.fillna(0)
+    if wins.empty:
+        return wins
+    wins = wins.sort_index(axis=1)
+    wins = wins[wins.sum(axis=0).sort_values(ascending=False).index]
+    return wins.div(wins.sum(axis=1), axis=0).fillna(0).sort_index()
+
+
+def title_streaks(state, kind="driver"):
+    champions = state["aggregates"][f"{kind}_champions"]
+    rows = [(entity, year) for year, names in champions.items() for entity in names]
+    if not rows:
+        return {}
+    df = pd.DataFrame(rows, columns=["Entity", "Year"]).drop_duplicates()
+    df = df.sort_values(["Entity", "Year"])
+    new_run = (df["Entity"] != df["Entity"].shift()) | (df["Year"].diff() != 1)
+    run_id = new_run.cumsum()
+    lengths = df.groupby(run_id).agg(Entity=("Entity", "first"), Length=("Year", "size"))
+    return lengths.groupby("Entity")["Length"].max().to_dict()
+
+
+def season_spearman(state):
+    return pd.Series(state["aggregates"]["rho"], dtype=float).dropna().sort_index()
+
+
+def season_spearman_ci(state):
+    bands = state["aggregates"]["bands"]
+    return pd.DataFrame(
+        [(year, low, high) for year, (low, high) in sorted(bands.items())],
+        columns=["Year", "ci_low", "ci_high"],
+    )
+
+
+def severe_pit_stops(state):
+    severe = state["aggregates"]["severe"]
+    if not severe:
+        return np.array([])
+    return np.concatenate([severe[year] for year in sorted(severe)])
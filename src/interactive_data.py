@@ -1,4 +1,6 @@
-﻿import json
+﻿import hashlib
+import json
+import re
 from pathlib import Path
 
 import numpy as np
@@ -8,10 +10,50 @@ from src.cleaning import (
     add_decade,
     add_driver_key,
     add_finish_pos,
-    add_grid_pos,
+    merge_race_grid,
+    own,
     spearman_corr,
     to_numeric,
 )
+from src.cube import AggregateCube
+from src.incremental import (
+    decade_share,
+    dominant_team_pct,
+    season_spearman,
+    season_spearman_ci,
+    severe_pit_stops,
+    title_streaks,
+)
+from src.pace import (
+    fastest_car_vs_champion,
+    gap_to_pole,
+    practice_race_correlation,
+    practice_race_pace,
+    qualifying_progression,
+    team_season_pace,
+)
+from src.ratings import EloRatings
+from src.scoring import title_changes
+from src.similarity import SimilarityIndex
+from src.simulation import sprint_title_simulation
+from src.stats import (
+    grouped_quantile_flags,
+    quantile_label,
+    season_spearman_bands,
+    sprint_permutation_test,
+)
+from src.strategy import (
+    REFUEL_BAN,
+    RIVAL_GRID_GAP,
+    STRATEGIES,
+    UNDERCUT_WINDOW,
+    reconstruct_stints,
+    strategy_shares,
+    undercut_pairs,
+    undercut_summary,
+)
+from src.teammates import career_tallies, head_to_head, ranked_careers, season_tallies
+from src.transitions import grid_transition_tensor
 
 try:
     from scipy.stats import spearmanr
@@ -32,22 +74,72 @@ def _write_json(path, data):
         json.dump(data, handle, ensure_ascii=True)
 
 
-def _merge_race_grid(race_details, starting_grids):
-    race = add_driver_key(add_finish_pos(race_details, "Pos"))
-    grid = add_driver_key(add_grid_pos(starting_grids, "Pos"))
+PACK_INDEX = "pack_index.json"
+# lazyChart('chart-b1-01', 'b1_01', ...) en app.js: el segundo argumento es
+# el JSON que pide la web.
+LAZY_CHART = re.compile(r"lazyChart\(\s*'[^']*'\s*,\s*'([^']+)'")
 
-    race["Year"] = to_numeric(race["Year"])
-    grid["Year"] = to_numeric(grid["Year"])
 
-    race = race.dropna(subset=["Year", "Grand Prix", "DriverKey"])
-    grid = grid.dropna(subset=["Year", "Grand Prix", "DriverKey"])
+def web_charts(output_dir):
+    # Graficas que carga docs/app.js; None si no hay app.js.
+    app = Path(output_dir) / "app.js"
+    if not app.exists():
+        return None
+    return set(LAZY_CHART.findall(app.read_text(encoding="utf-8-sig")))
 
-    merged = race.merge(
-        grid[["Year", "Grand Prix", "DriverKey", "GridPos"]],
-        on=["Year", "Grand Prix", "DriverKey"],
-        how="inner",
-    )
-    return merged
+
+def write_data_pack(output_dir):
+    # Junta en un unico data/pack.<hash>.ndjson, una linea por grafica, solo
+    # los JSON de data/ que pide app.js (el resto, p. ej. careers/ o los
+    # bloques sin grafica web, no se descargan nunca). pack_index.json guarda
+    # el nombre del pack y el offset, longitud y sha256 de cada grafica para
+    # pedir solo ese rango; el nombre cambia con el contenido, asi que el
+    # pack se puede cachear indefinidamente.
+    data_dir = Path(output_dir) / "data"
+    index_path = data_dir / PACK_INDEX
+    previous = None
+    if index_path.exists():
+        with open(index_path, "r", encoding="utf-8") as handle:
+            previous = json.load(handle).get("file")
+    wanted = web_charts(output_dir)
+    charts = {}
+    chunks = []
+    offset = 0
+    for path in sorted(data_dir.glob("*.json")):
+        if path.name == PACK_INDEX or (wanted is not None and path.stem not in wanted):
+            continue
+        body = path.read_bytes().strip() + b"\n"
+        charts[path.stem] = {
+            "offset": offset,
+            "length": len(body),
+            "sha256": hashlib.sha256(body).hexdigest(),
+        }
+        chunks.append(body)
+        offset += len(body)
+
+    pack = b"".join(chunks)
+    version = hashlib.sha256(pack).hexdigest()[:16]
+    filename = f"pack.{version}.ndjson"
+    pack_path = data_dir / filename
+    if not pack_path.exists():
+        tmp = pack_path.with_name(f".{filename}.tmp")
+        tmp.write_bytes(pack)
+        tmp.replace(pack_path)
+    if previous != filename:
+        # Las paginas abiertas siguen con el indice anterior: su pack se
+        # conserva una generacion y solo se borran los mas antiguos.
+        for old in data_dir.glob("pack.*.ndjson"):
+            if old.name not in (filename, previous):
+                old.unlink()
+    index = {"version": version, "file": filename, "bytes": len(pack), "charts": charts}
+    _write_json(index_path, index)
+    return index
+
+
+def _optional(value):
+    if value is None or np.isnan(value):
+        return None
+    return float(value)
 
 
 def _spearman(x, y):
@@ -106,7 +198,7 @@ def _max_consecutive_years(years):
 
 
 def _compute_streaks(df, entity_col):
-    df = df.copy()
+    df = own(df)
     df["Year"] = to_numeric(df["Year"])
     df["PosNum"] = to_numeric(df["Pos"])
     df = df[(df["PosNum"] == 1) & df["Year"].notna()]
@@ -118,6 +210,14 @@ def _compute_streaks(df, entity_col):
     return streaks
 
 
+def _top15(streaks):
+    items = sorted(streaks.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {
+        "labels": [item[0] for item in items][::-1],
+        "values": [item[1] for item in items][::-1],
+    }
+
+
 def export_interactive_data(
     race_details,
     driver_standings,
@@ -127,19 +227,46 @@ def export_interactive_data(
     sprint_results,
     sprint_grid,
     output_dir,
+    cube=None,
+):
+    export_block1_data(
+        race_details,
+        driver_standings,
+        constructor_standings,
+        starting_grids,
+        output_dir,
+        cube=cube,
+    )
+    export_block2_data(race_details, starting_grids, output_dir)
+    export_block3_data(pitstops, race_details, output_dir)
+    export_block4_data(
+        race_details,
+        driver_standings,
+        starting_grids,
+        sprint_results,
+        sprint_grid,
+        output_dir,
+    )
+
+
+def export_block1_data(
+    race_details,
+    driver_standings,
+    constructor_standings,
+    starting_grids,
+    output_dir,
+    cube=None,
 ):
     data_dir = Path(output_dir) / "data"
 
+    if cube is None:
+        cube = AggregateCube.from_frames(race_details, starting_grids)
+
     # B1_01
-    df = race_details.copy()
-    df["Year"] = to_numeric(df["Year"])
-    df = df.dropna(subset=["Year", "Grand Prix", "Car"])
-    df["Year"] = df["Year"].astype(int)
-    df = add_finish_pos(df, "Pos")
-    winners = df[df["FinishPos"] == 1]
-    total_races = df[["Year", "Grand Prix"]].drop_duplicates().groupby("Year").size()
-    wins = winners.groupby(["Year", "Car"]).size()
-    max_wins = wins.groupby("Year").max()
+    wins = cube.rollup(["Year", "Car"], ["wins"])
+    wins = wins[wins["wins"] > 0]
+    max_wins = wins.groupby("Year")["wins"].max()
+    total_races = cube.rollup(["Year", "Grand Prix"], []).groupby("Year").size()
     pct = (max_wins / total_races).sort_index() * 100
     _write_json(
         data_dir / "b1_01.json",
@@ -147,12 +274,12 @@ def export_interactive_data(
     )
 
     # B1_02
-    df = race_details.copy()
-    df = add_finish_pos(df, "Pos")
-    df = df[df["FinishPos"] == 1]
-    df = add_decade(df, "Year")
-    df = df.dropna(subset=["Car"])
-    wins_by_decade = df.groupby(["Decade", "Car"]).size().unstack(fill_value=0)
+    wins = cube.rollup(["Year", "Car"], ["wins"])
+    wins = wins[wins["wins"] > 0]
+    wins["Decade"] = (wins["Year"] // 10) * 10
+    wins_by_decade = (
+        wins.groupby(["Decade", "Car"])["wins"].sum().unstack(fill_value=0)
+    )
     if not wins_by_decade.empty:
         total_wins = wins_by_decade.sum(axis=0).sort_values(ascending=False)
         wins_by_decade = wins_by_decade[total_wins.index]
@@ -171,19 +298,15 @@ def export_interactive_data(
     # B1_03
     driver_streaks = _compute_streaks(driver_standings, "Driver")
     team_streaks = _compute_streaks(constructor_standings, "Team")
-
-    def _top15(streaks):
-        items = sorted(streaks.items(), key=lambda item: item[1], reverse=True)[:15]
-        return {
-            "labels": [item[0] for item in items][::-1],
-            "values": [item[1] for item in items][::-1],
-        }
-
     _write_json(data_dir / "b1_03a.json", _top15(driver_streaks))
     _write_json(data_dir / "b1_03b.json", _top15(team_streaks))
 
+
+def export_block2_data(race_details, starting_grids, output_dir, bands=None, tensor=None):
+    data_dir = Path(output_dir) / "data"
+
     # B2_01
-    merged = _merge_race_grid(race_details, starting_grids)
+    merged = merge_race_grid(race_details, starting_grids)
     merged = merged.dropna(subset=["FinishPos", "GridPos"])
     rows = []
     for year, group in merged.groupby("Year"):
@@ -191,32 +314,52 @@ def export_interactive_data(
         if not np.isnan(rho):
             rows.append((int(year), float(rho)))
     rows.sort(key=lambda item: item[0])
+    if bands is None:
+        bands = season_spearman_bands(race_details, starting_grids)
+    bands = bands.set_index("Year")
+    years = [r[0] for r in rows]
     _write_json(
         data_dir / "b2_01.json",
-        {"years": [r[0] for r in rows], "rho": [r[1] for r in rows]},
+        {
+            "years": years,
+            "rho": [r[1] for r in rows],
+            "ci_low": [_optional(bands["ci_low"].get(year)) for year in years],
+            "ci_high": [_optional(bands["ci_high"].get(year)) for year in years],
+        },
     )
 
     # B2_02
-    merged = _merge_race_grid(race_details, starting_grids)
-    merged = merged.dropna(subset=["FinishPos", "GridPos"])
-    merged = add_decade(merged, "Year")
-    merged["Podium"] = merged["FinishPos"] <= 3
+    if tensor is None:
+        tensor = grid_transition_tensor(race_details, starting_grids)
+    podium = tensor.top_k(3)
     decade_traces = []
-    for decade, group in merged.groupby("Decade"):
-        prob = group.groupby("GridPos")["Podium"].mean().reset_index()
-        prob = prob.dropna(subset=["GridPos"])
-        if not prob.empty:
+    for i, decade in enumerate(tensor.decades):
+        slots = tensor.grid_slots(i)
+        if len(slots):
             decade_traces.append(
                 {
                     "decade": int(decade),
-                    "x": prob["GridPos"].tolist(),
-                    "y": prob["Podium"].tolist(),
+                    "x": slots.tolist(),
+                    "y": podium[i, slots].tolist(),
                 }
             )
-    _write_json(data_dir / "b2_02.json", {"traces": decade_traces})
+    # Tensor completo (decada x grid x final, final 0 = no clasificado) en
+    # plano y sin la fila de grid 0, para el mapa de calor de la web.
+    counts = tensor.counts[:, 1:, :]
+    _write_json(
+        data_dir / "b2_02.json",
+        {
+            "traces": decade_traces,
+            "transitions": {
+                "decades": [int(decade) for decade in tensor.decades],
+                "shape": list(counts.shape),
+                "counts": counts.ravel().tolist(),
+            },
+        },
+    )
 
     # B2_03
-    merged = _merge_race_grid(race_details, starting_grids)
+    merged = merge_race_grid(race_details, starting_grids)
     merged = merged.dropna(subset=["FinishPos", "GridPos"])
     merged = add_decade(merged, "Year")
     merged["Delta"] = merged["FinishPos"] - merged["GridPos"]
@@ -227,6 +370,10 @@ def export_interactive_data(
             box_traces.append({"label": str(int(decade)), "values": values})
     _write_json(data_dir / "b2_03.json", {"traces": box_traces})
 
+
+def export_block3_data(pitstops, race_details, output_dir, percentile=0.95):
+    data_dir = Path(output_dir) / "data"
+
     # B3_01
     merged = _merge_pit_race(pitstops, race_details)
     scatter = {
@@ -276,23 +423,92 @@ def export_interactive_data(
     )
 
     # B3_03
-    pit = pitstops.copy()
+    pit = own(pitstops)
     pit["Year"] = to_numeric(pit["Year"])
     pit_time_col = _pit_time_column(pit)
     pit["PitTime"] = to_numeric(pit[pit_time_col])
     pit = pit.dropna(subset=["PitTime", "Year"])
-    thresholds = pit.groupby("Year")["PitTime"].quantile(0.95)
-    pit = pit.merge(thresholds.rename("P95"), left_on="Year", right_index=True, how="left")
-    severe = pit[pit["PitTime"] > pit["P95"]]
-    _write_json(data_dir / "b3_03.json", {"values": severe["PitTime"].tolist()})
+    flags, _ = grouped_quantile_flags(pit, "PitTime", {"season": ["Year"]}, [percentile])
+    label = quantile_label(percentile)
+    severe = pit[flags[f"season_{label}"]]
+    _write_json(
+        data_dir / "b3_03.json",
+        {"values": severe["PitTime"].tolist(), "percentile": label},
+    )
+
+
+def export_incremental_data(state, output_dir):
+    # Mismos JSON de B1, B2_01 y B3_03 que la ejecucion completa, a partir
+    # del estado de --ingest (sin releer los CSV).
+    data_dir = Path(output_dir) / "data"
+
+    # B1_01
+    pct = dominant_team_pct(state)
+    _write_json(
+        data_dir / "b1_01.json",
+        {"years": pct.index.astype(int).tolist(), "pct": pct.values.tolist()},
+    )
+
+    # B1_02
+    share = decade_share(state)
+    _write_json(
+        data_dir / "b1_02.json",
+        {
+            "decades": share.index.astype(int).tolist(),
+            "teams": share.columns.tolist(),
+            "z": share.values.tolist(),
+        },
+    )
+
+    # B1_03
+    _write_json(data_dir / "b1_03a.json", _top15(title_streaks(state, "driver")))
+    _write_json(data_dir / "b1_03b.json", _top15(title_streaks(state, "team")))
+
+    # B2_01
+    rho = season_spearman(state)
+    bands = season_spearman_ci(state).set_index("Year")
+    ci_low = bands["ci_low"].to_dict()
+    ci_high = bands["ci_high"].to_dict()
+    years = rho.index.astype(int).tolist()
+    _write_json(
+        data_dir / "b2_01.json",
+        {
+            "years": years,
+            "rho": rho.values.tolist(),
+            "ci_low": [_optional(ci_low.get(year)) for year in years],
+            "ci_high": [_optional(ci_high.get(year)) for year in years],
+        },
+    )
+
+    # B3_03
+    _write_json(
+        data_dir / "b3_03.json",
+        {
+            "values": severe_pit_stops(state).tolist(),
+            "percentile": quantile_label(state["percentile"]),
+        },
+    )
+
+
+def export_block4_data(
+    race_details,
+    driver_standings,
+    starting_grids,
+    sprint_results,
+    sprint_grid,
+    output_dir,
+    test=None,
+    simulation=None,
+):
+    data_dir = Path(output_dir) / "data"
 
     # B4_01
-    sprint = sprint_results.copy()
+    sprint = own(sprint_results)
     sprint["Year"] = to_numeric(sprint["Year"])
     sprint["PTS"] = to_numeric(sprint["PTS"])
     sprint = sprint.dropna(subset=["Year", "PTS"])
 
-    standings = driver_standings.copy()
+    standings = own(driver_standings)
     standings["Year"] = to_numeric(standings["Year"])
     standings["PTS"] = to_numeric(standings["PTS"])
     standings = standings.dropna(subset=["Year", "PTS"])
@@ -367,10 +583,12 @@ def export_interactive_data(
 
     sprint_values = variance.loc[variance["Sprint"], "FinishPos"].dropna().tolist()
     nonsprint_values = variance.loc[~variance["Sprint"], "FinishPos"].dropna().tolist()
+    if test is None:
+        test = sprint_permutation_test(race_details, sprint_results)
 
     _write_json(
         data_dir / "b4_03.json",
-        {"sprint": sprint_values, "nonsprint": nonsprint_values},
+        {"sprint": sprint_values, "nonsprint": nonsprint_values, "test": test},
     )
 
     # B4_04
@@ -421,3 +639,266 @@ def export_interactive_data(
             "impacts": [float(r[2]) for r in rows],
         },
     )
+
+    # B4_05
+    if simulation is None:
+        simulation = sprint_title_simulation(race_details, sprint_results)
+    summary, probabilities = simulation
+    _write_json(
+        data_dir / "b4_05.json",
+        {
+            "years": summary["Year"].astype(int).tolist(),
+            "n_sims": summary["n_sims"].astype(int).tolist(),
+            "flip_rate": summary["flip_rate"].tolist(),
+            "drivers": [
+                {
+                    "year": int(year),
+                    "drivers": part["Driver"].tolist(),
+                    "p_with_sprint": part["p_with_sprint"].tolist(),
+                    "p_without_sprint": part["p_without_sprint"].tolist(),
+                }
+                for year, part in probabilities.groupby("Year")
+            ],
+        },
+    )
+
+
+def export_pace_data(qualifyings, practices, fastestlaps_detailed, output_dir):
+    data_dir = Path(output_dir) / "data"
+
+    # B5_01
+    gaps = gap_to_pole(qualifyings).dropna()
+    _write_json(
+        data_dir / "b5_01.json",
+        {
+            "years": gaps["Year"].tolist(),
+            "median_gap": gaps["median_gap"].tolist(),
+            "pole_margin": gaps["pole_margin"].tolist(),
+        },
+    )
+
+    # B5_02
+    progression = qualifying_progression(qualifyings).dropna()
+    _write_json(
+        data_dir / "b5_02.json",
+        {
+            "years": progression["Year"].tolist(),
+            "q1_q2": progression["q1_q2"].tolist(),
+            "q2_q3": progression["q2_q3"].tolist(),
+        },
+    )
+
+    # B5_03
+    pace = practice_race_pace(practices, fastestlaps_detailed)
+    corr = practice_race_correlation(pace)
+    _write_json(
+        data_dir / "b5_03.json",
+        {
+            "years": corr["Year"].tolist(),
+            "rho": corr["rho"].tolist(),
+            "n": corr["n"].astype(int).tolist(),
+        },
+    )
+
+
+def export_car_pace_data(
+    fastestlaps_detailed, fastest_laps, driver_standings, output_dir, comparison=None
+):
+    data_dir = Path(output_dir) / "data"
+    if comparison is None:
+        comparison = fastest_car_vs_champion(fastestlaps_detailed, fastest_laps, driver_standings)
+    pace = team_season_pace(fastestlaps_detailed)
+    pace = pace[pace["eligible"]].sort_values(["Year", "pace"])
+
+    # B5_04
+    _write_json(
+        data_dir / "b5_04.json",
+        {
+            "years": comparison["Year"].astype(int).tolist(),
+            "champion": comparison["champion"].tolist(),
+            "champion_car": comparison["champion_car"].tolist(),
+            "fastest_car": comparison["fastest_car"].tolist(),
+            "method": comparison["method"].tolist(),
+            "same_car": comparison["same_car"].tolist(),
+            "champion_gap": [_optional(value) for value in comparison["champion_gap"]],
+            "pace": {
+                "years": pace["Year"].astype(int).tolist(),
+                "cars": pace["Car"].tolist(),
+                "pace": pace["pace"].round(3).tolist(),
+                "races": pace["races"].astype(int).tolist(),
+            },
+        },
+    )
+
+
+def export_teammate_data(race_details, qualifyings, output_dir, duels=None):
+    data_dir = Path(output_dir) / "data"
+    if duels is None:
+        duels = head_to_head(race_details, qualifyings)
+
+    # B6_01
+    ranked = ranked_careers(career_tallies(duels))
+    seasons = season_tallies(duels)
+    drivers = sorted(set(seasons["Driver"]) | set(seasons["Teammate"]))
+    position = {name: i for i, name in enumerate(drivers)}
+    _write_json(
+        data_dir / "b6_01.json",
+        {
+            "career": {
+                "drivers": ranked["Driver"].tolist(),
+                "race_pct": ranked["race_pct"].tolist(),
+                "qualifying_pct": ranked["qualifying_pct"].tolist(),
+                "race_duels": ranked["race_duels"].astype(int).tolist(),
+                "qualifying_duels": ranked["qualifying_duels"].astype(int).tolist(),
+            },
+            "drivers": drivers,
+            "seasons": {
+                "years": seasons["Year"].astype(int).tolist(),
+                "driver": seasons["Driver"].map(position).tolist(),
+                "teammate": seasons["Teammate"].map(position).tolist(),
+                **{
+                    col: seasons[col].astype(int).tolist()
+                    for col in ["race_won", "race_duels", "qualifying_won", "qualifying_duels"]
+                },
+            },
+        },
+    )
+
+
+def export_rating_data(race_details, sprint_results, output_dir, ratings=None, top=8):
+    data_dir = Path(output_dir) / "data"
+    if ratings is None:
+        ratings = EloRatings.from_frames(race_details, sprint_results)
+
+    # B6_02
+    table = ratings.table()
+    leaders = table.head(top)["Driver"].tolist()
+    history = ratings.history()
+    by_driver = history[history["Driver"].isin(leaders)].groupby("Driver")
+    _write_json(
+        data_dir / "b6_02.json",
+        {
+            "k": ratings.k,
+            "sprint_weight": ratings.sprint_weight,
+            "series": [
+                {
+                    "driver": driver,
+                    "season": by_driver.get_group(driver)["Season"].round(3).tolist(),
+                    "rating": by_driver.get_group(driver)["Rating"].round(1).tolist(),
+                }
+                for driver in leaders
+            ],
+            "ranking": {
+                "drivers": table["Driver"].head(50).tolist(),
+                "peak": table["peak"].head(50).round(1).tolist(),
+                "rating": table["rating"].head(50).round(1).tolist(),
+                "events": table["events"].head(50).astype(int).tolist(),
+            },
+        },
+    )
+
+
+def export_scoring_data(
+    race_details, driver_standings, sprint_results, fastest_laps, output_dir, changes=None
+):
+    data_dir = Path(output_dir) / "data"
+    if changes is None:
+        changes = title_changes(race_details, driver_standings, sprint_results, fastest_laps)
+    table, changed = changes
+
+    # B7_01
+    _write_json(
+        data_dir / "b7_01.json",
+        {
+            "schemes": changed.columns.tolist(),
+            "changed": changed.sum().astype(int).tolist(),
+            "years": table.index.astype(int).tolist(),
+            "official": table["official"].tolist(),
+            "champions": {name: table[name].tolist() for name in changed.columns},
+        },
+    )
+
+
+def export_similarity_data(race_details, starting_grids, output_dir, index=None, k=5):
+    data_dir = Path(output_dir) / "data"
+    if index is None:
+        index = SimilarityIndex.from_frames(race_details, starting_grids)
+    neighbours, scores = index.search(k=k, metric="cosine")
+    _write_json(
+        data_dir / "driver_similarity.json",
+        {
+            "metric": "cosine",
+            "features": index.feature_names,
+            "drivers": index.names,
+            "neighbours": neighbours.tolist(),
+            "scores": np.round(scores.astype(float), 4).tolist(),
+        },
+    )
+
+
+def export_strategy_data(
+    pitstops, race_details, starting_grids, output_dir, strategy=None, undercuts=None
+):
+    data_dir = Path(output_dir) / "data"
+    if strategy is None:
+        strategy = reconstruct_stints(pitstops, race_details)
+    if undercuts is None:
+        undercuts = undercut_pairs(pitstops, race_details, starting_grids, strategy=strategy)
+    stints, strategies = strategy
+
+    # B8_01
+    shares = strategy_shares(strategies)
+    stint_counts = stints["StintLaps"].dropna().astype(int).value_counts().sort_index()
+    _write_json(
+        data_dir / "b8_01.json",
+        {
+            "years": shares.index.astype(int).tolist(),
+            "strategies": STRATEGIES,
+            "pct": {name: (shares[name] * 100).round(2).tolist() for name in STRATEGIES},
+            "median_stint": shares["median_stint"].round(2).tolist(),
+            "stint_laps": {
+                "laps": stint_counts.index.astype(int).tolist(),
+                "count": stint_counts.astype(int).tolist(),
+            },
+        },
+    )
+
+    # B8_02
+    classified = strategies.dropna(subset=["FinishPos"])
+    era = np.where(classified["Year"] < REFUEL_BAN, "Con repostaje", "Sin repostaje")
+    _write_json(
+        data_dir / "b8_02.json",
+        {
+            "traces": [
+                {
+                    "label": f"{name} - {label}",
+                    "values": classified.loc[
+                        (classified["Strategy"] == name) & (era == label), "FinishPos"
+                    ].astype(int).tolist(),
+                }
+                for name in STRATEGIES
+                for label in ["Con repostaje", "Sin repostaje"]
+            ],
+        },
+    )
+
+    # B8_03
+    summary = undercut_summary(undercuts)
+    _write_json(
+        data_dir / "b8_03.json",
+        {
+            "window": UNDERCUT_WINDOW,
+            "rival_grid_gap": RIVAL_GRID_GAP,
+            "series": [
+                {
+                    "relation": relation,
+                    "offsets": part["Offset"].astype(int).tolist(),
+                    "pairs": part["pairs"].astype(int).tolist(),
+                    "ahead_rate": (part["ahead_rate"] * 100).round(2).tolist(),
+                    "behind": part["behind"].astype(int).tolist(),
+                    "rate": [_optional(value) for value in (part["rate"] * 100).round(2)],
+                }
+                for relation, part in summary.groupby("Relation")
+            ],
+        },
+    )
@@ -0,0 +1,196 @@
+﻿import numpy as np
+import pandas as pd
+
+from src.cleaning import add_driver_key, own, parse_time, to_numeric
+
+
+RACE_KEYS = ["Year", "Grand Prix"]
+QUALI_SESSIONS = ["Q1", "Q2", "Q3", "Time"]
+
+
+def _prepare(df):
+    df = add_driver_key(df)
+    df["Year"] = to_numeric(df["Year"])
+    return df.dropna(subset=["Year", "Grand Prix", "DriverKey"])
+
+
+def qualifying_times(qualifyings):
+    quali = _prepare(qualifyings)
+    sessions = [col for col in QUALI_SESSIONS if col in quali.columns]
+    for col in sessions:
+        quali[f"{col}Sec"] = parse_time(quali[col])
+    quali["BestTime"] = quali[[f"{col}Sec" for col in sessions]].min(axis=1)
+    return quali
+
+
+def gap_to_pole(qualifyings):
+    quali = qualifying_times(qualifyings).dropna(subset=["BestTime"])
+    quali = quali.groupby(RACE_KEYS + ["DriverKey"])["BestTime"].min().reset_index()
+    quali = quali[quali.groupby(RACE_KEYS)["BestTime"].transform("size") > 1]
+    pole = quali.groupby(RACE_KEYS)["BestTime"].transform("min")
+    quali["GapPct"] = (quali["BestTime"] / pole - 1) * 100
+
+    quali = quali.sort_values(RACE_KEYS + ["BestTime"])
+    second = quali[quali.groupby(RACE_KEYS).cumcount() == 1]
+
+    by_year = quali.groupby("Year")["GapPct"].median().rename("median_gap")
+    margin = second.groupby("Year")["GapPct"].median().rename("pole_margin")
+    result = pd.concat([by_year, margin], axis=1).sort_index().reset_index()
+    result["Year"] = result["Year"].astype(int)
+    return result
+
+
+def qualifying_progression(qualifyings):
+    quali = qualifying_times(qualifyings)
+    if not {"Q1Sec", "Q2Sec", "Q3Sec"}.issubset(quali.columns):
+        raise ValueError("qualifyings.csv no contiene columnas Q1/Q2/Q3")
+    quali["Q1Q2"] = (quali["Q2Sec"] / quali["Q1Sec"] - 1) * 100
+    quali["Q2Q3"] = (quali["Q3Sec"] / quali["Q2Sec"] - 1) * 100
+    quali = quali.dropna(subset=["Q1Q2"])
+
+    result = (
+        quali.groupby("Year")
+        .agg(
+            q1_q2=("Q1Q2", "median"),
+            q2_q3=("Q2Q3", "median"),
+            drivers_q2=("Q1Q2", "size"),
+            drivers_q3=("Q2Q3", "count"),
+        )
+        .sort_index()
+        .reset_index()
+    )
+    result["Year"] = result["Year"].astype(int)
+    return result
+
+
+def practice_race_pace(practices, fastestlaps_detailed):
+    practice = _prepare(practices)
+    practice["LapTime"] = parse_time(practice["Time"])
+    practice = practice.dropna(subset=["LapTime"])
+    practice = (
+        practice.groupby(RACE_KEYS + ["DriverKey"])["LapTime"].min().reset_index()
+    )
+    practice["PracticeGap"] = (
+        practice["LapTime"] / practice.groupby(RACE_KEYS)["LapTime"].transform("min") - 1
+    ) * 100
+
+    race = _prepare(fastestlaps_detailed)
+    race["LapTime"] = parse_time(race["Time"])
+    race = race.dropna(subset=["LapTime"])
+    race = race.groupby(RACE_KEYS + ["DriverKey"])["LapTime"].min().reset_index()
+    race["RaceGap"] = (
+        race["LapTime"] / race.groupby(RACE_KEYS)["LapTime"].transform("min") - 1
+    ) * 100
+
+    merged = practice.merge(
+        race[RACE_KEYS + ["DriverKey", "RaceGap"]],
+        on=RACE_KEYS + ["DriverKey"],
+        how="inner",
+    )
+    return merged
+
+
+def practice_race_correlation(pace):
+    # Spearman por temporada en un solo pase: rangos por grupo y momentos agregados.
+    if pace.empty:
+        return pd.DataFrame(columns=["Year", "rho", "n"])
+    ranks = pace.groupby("Year")[["PracticeGap", "RaceGap"]].rank()
+    moments = pd.DataFrame(
+        {
+            "Year": pace["Year"],
+            "x": ranks["PracticeGap"],
+            "y": ranks["RaceGap"],
+            "xx": ranks["PracticeGap"] ** 2,
+            "yy": ranks["RaceGap"] ** 2,
+            "xy": ranks["PracticeGap"] * ranks["RaceGap"],
+        }
+    ).groupby("Year")
+    means = moments.mean()
+    n = moments.size()
+    cov = means["xy"] - means["x"] * means["y"]
+    var_x = means["xx"] - means["x"] ** 2
+    var_y = means["yy"] - means["y"] ** 2
+    rho = cov / np.sqrt(var_x * var_y)
+
+    result = pd.DataFrame({"rho": rho, "n": n}).dropna()
+    result = result[result["n"] >= 2].sort_index().reset_index()
+    result["Year"] = result["Year"].astype(int)
+    return result
+
+
+def car_lap_gaps(fastestlaps_detailed):
+    # Mejor vuelta rapida de cada coche por carrera normalizada contra la mejor
+    # de ese circuito y temporada: GapPct = 0 para el coche mas rapido.
+    laps = own(fastestlaps_detailed)[RACE_KEYS + ["Car", "Time"]]
+    laps["Year"] = to_numeric(laps["Year"])
+    laps["LapTime"] = parse_time(laps["Time"])
+    laps = laps.dropna(subset=RACE_KEYS + ["Car", "LapTime"])
+    laps["Year"] = laps["Year"].astype(int)
+    laps = laps.groupby(RACE_KEYS + ["Car"], as_index=False)["LapTime"].min()
+    by_race = laps.groupby(RACE_KEYS)["LapTime"]
+    laps["GapPct"] = (laps["LapTime"] / by_race.transform("min") - 1) * 100
+    laps["Cars"] = by_race.transform("size")
+    return laps
+
+
+def team_season_pace(fastestlaps_detailed, min_share=0.5):
+    # Ritmo relativo por equipo y temporada en una sola agregacion: mediana
+    # del GapPct en las carreras con al menos dos coches con tiempo. share es
+    # la fraccion de esas carreras en las que el equipo marco tiempo y
+    # coverage la de carreras de la temporada con mas de un coche.
+    laps = car_lap_gaps(fastestlaps_detailed)
+    all_races = laps[RACE_KEYS].drop_duplicates().groupby("Year").size()
+    laps = laps[laps["Cars"] > 1]
+    races = laps[RACE_KEYS].drop_duplicates().groupby("Year").size()
+    pace = laps.groupby(["Year", "Car"]).agg(
+        pace=("GapPct", "median"),
+        best=("GapPct", "min"),
+        races=("GapPct", "size"),
+    ).reset_index()
+    pace["share"] = pace["races"] / pace["Year"].map(races)
+    pace["coverage"] = pace["Year"].map(races / all_races)
+    pace["eligible"] = (pace["share"] >= min_share) & (pace["coverage"] >= min_share)
+    return pace
+
+
+def fastest_car_vs_champion(fastestlaps_detailed, fastest_laps, driver_standings, min_share=0.5):
+    # Por temporada: coche mas rapido (menor ritmo relativo entre los que
+    # corren al menos min_share de las carreras) frente al coche del campeon.
+    # Antes de 1983 solo hay una vuelta rapida por carrera: en las temporadas
+    # sin cobertura suficiente el coche mas rapido es el que suma mas vueltas
+    # rapidas (fastest_laps.csv).
+    pace = team_season_pace(fastestlaps_detailed, min_share)
+    eligible = pace[pace["eligible"]].sort_values(["Year", "pace", "best"], kind="stable")
+    by_pace = eligible.drop_duplicates("Year").set_index("Year")
+
+    fastest = own(fastest_laps)[["Year", "Car"]]
+    fastest["Year"] = to_numeric(fastest["Year"])
+    fastest = fastest.dropna()
+    fastest["Year"] = fastest["Year"].astype(int)
+    counts = fastest.groupby(["Year", "Car"]).size().rename("fastest_laps").reset_index()
+    by_laps = (
+        counts.sort_values(["Year", "fastest_laps"], ascending=[True, False], kind="stable")
+        .drop_duplicates("Year")
+        .set_index("Year")
+    )
+
+    standings = own(driver_standings)[["Year", "Pos", "Driver", "Car"]]
+    standings["Year"] = to_numeric(standings["Year"])
+    standings = standings[to_numeric(standings["Pos"]) == 1].dropna(subset=["Year"])
+    standings["Year"] = standings["Year"].astype(int)
+    result = standings.drop_duplicates("Year").set_index("Year")[["Driver", "Car"]]
+    result = result.rename(columns={"Driver": "champion", "Car": "champion_car"})
+
+    result["fastest_car"] = by_pace["Car"].reindex(result.index)
+    result["method"] = np.where(result["fastest_car"].notna(), "ritmo", "vueltas rapidas")
+    result["fastest_car"] = result["fastest_car"].fillna(by_laps["Car"].reindex(result.index))
+    result["same_car"] = result["champion_car"] == result["fastest_car"]
+
+    pace_by_car = pace.set_index(["Year", "Car"])["pace"]
+    keys = pd.MultiIndex.from_arrays([result.index, result["champion_car"]])
+    result["champion_gap"] = pace_by_car.reindex(keys).to_numpy() - by_pace["pace"].reindex(
+        result.index
+    ).to_numpy()
+    lap_counts = counts.set_index(["Year", "Car"])["fastest_laps"]
+    result["champion_fastest_laps"] = lap_counts.reindex(keys).fillna(0).astype(int).to_numpy()
+    return result.sort_index().reset_index()
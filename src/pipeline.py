@@ -0,0 +1,433 @@
+﻿from pathlib import Path
+
+from src.careers import CareerIndex, export_driver_careers
+from src.cube import AggregateCube
+from src.data_loader import BASE_DIR, load_csvs
+from src.database import load_tables
+from src.interactive_data import (
+    export_block1_data,
+    export_block2_data,
+    export_block3_data,
+    export_block4_data,
+    export_car_pace_data,
+    export_pace_data,
+    export_rating_data,
+    export_scoring_data,
+    export_similarity_data,
+    export_strategy_data,
+    export_teammate_data,
+)
+from src.pace import fastest_car_vs_champion
+from src.plots_block1 import plot_b1_01, plot_b1_02, plot_b1_03
+from src.plots_block2 import (
+    plot_b2_01,
+    plot_b2_02,
+    plot_b2_03,
+    render_b2_02_seasons,
+)
+from src.plots_block3 import plot_b3_01, plot_b3_02, plot_b3_03, render_b3_01_teams
+from src.plots_block4 import (
+    plot_b4_01,
+    plot_b4_02,
+    plot_b4_03,
+    plot_b4_04,
+    plot_b4_05,
+)
+from src.plots_block5 import plot_b5_01, plot_b5_02, plot_b5_03, plot_b5_04
+from src.plots_block6 import plot_b6_01, plot_b6_02
+from src.plots_block7 import plot_b7_01
+from src.plots_block8 import plot_b8_01, plot_b8_02, plot_b8_03
+from src.ratings import EloRatings
+from src.scoring import title_changes
+from src.simulation import sprint_title_simulation
+from src.stats import season_spearman_bands, sprint_permutation_test
+from src.strategy import reconstruct_stints, undercut_pairs
+from src.teammates import head_to_head
+from src.transitions import grid_transition_tensor
+
+
+DATASETS = {
+    "race_details": (
+        "race_details.csv",
+        ["Pos", "Driver", "Car", "Year", "Grand Prix"],
+    ),
+    "driver_standings": (
+        "driver_standings.csv",
+        ["Pos", "Driver", "Year", "PTS"],
+    ),
+    "constructor_standings": (
+        "constructor_standings.csv",
+        ["Pos", "Team", "Year"],
+    ),
+    "starting_grids": (
+        "starting_grids.csv",
+        ["Pos", "Driver", "Year", "Grand Prix"],
+    ),
+    "pitstops": (
+        "pitstops.csv",
+        ["Driver", "Year", "Grand Prix"],
+    ),
+    "sprint_results": (
+        "sprint_results.csv",
+        ["Pos", "Driver", "Year", "Grand Prix", "PTS"],
+    ),
+    "sprint_grid": (
+        "sprint_grid.csv",
+        ["Pos", "Driver", "Year", "Grand Prix"],
+    ),
+    "qualifyings": (
+        "qualifyings.csv",
+        ["Driver", "Year", "Grand Prix", "Q1", "Q2", "Q3", "Time"],
+    ),
+    "practices": (
+        "practices.csv",
+        ["Driver", "Year", "Grand Prix", "Time"],
+    ),
+    "fastestlaps_detailed": (
+        "fastestlaps_detailed.csv",
+        ["Driver", "Year", "Grand Prix", "Time"],
+    ),
+    "fastest_laps": (
+        "fastest_laps.csv",
+        ["Driver", "Year", "Grand Prix"],
+    ),
+    "driver_details": (
+        "driver_details.csv",
+        ["Car", "Date", "Driver", "Grand Prix", "PTS", "Race Position"],
+    ),
+}
+
+# Percentil por temporada a partir del cual una parada es grave (B3_03).
+DEFAULT_PIT_PERCENTILE = 0.95
+
+_pit_percentile = DEFAULT_PIT_PERCENTILE
+
+
+def set_pit_percentile(percentile):
+    global _pit_percentile
+    if not 0 < percentile < 1:
+        raise ValueError(
+            f"Percentil de paradas fuera de rango: {percentile} (debe estar entre 0 y 1)"
+        )
+    _pit_percentile = percentile
+
+
+def get_pit_percentile():
+    return _pit_percentile
+
+
+def _build_cube(frames, base_dir):
+    cube = AggregateCube.from_frames(frames["race_details"], frames["starting_grids"])
+    cube.save(Path(base_dir) / "outputs" / "aggregate_cube.npz")
+    return cube
+
+
+def _build_ratings(frames, base_dir):
+    # El rating se procesa carrera a carrera: si solo se han anexado carreras
+    # se continua desde el estado guardado en lugar de empezar en 1950.
+    path = Path(base_dir) / "outputs" / "elo_ratings.pkl"
+    race_details = frames["race_details"]
+    sprint_results = frames["sprint_results"]
+    ratings = frames.get("ratings")
+    if ratings is None and path.exists():
+        ratings = EloRatings.load(path)
+    if ratings is None or not ratings.matches_prefix(race_details, sprint_results):
+        ratings = EloRatings()
+    ratings.extend(race_details, sprint_results)
+    ratings.save(path)
+    return ratings
+
+
+# Artefactos derivados de varios datasets: se reconstruyen cuando cambia
+# cualquiera de sus entradas y cuentan como "cambiados" para las etapas.
+DERIVED = {
+    "cube": (["race_details", "starting_grids"], _build_cube),
+    "ratings": (["race_details", "sprint_results"], _build_ratings),
+}
+
+
+def _stage_b1(frames, output_dir, docs_dir):
+    entries = [
+        plot_b1_01(frames["race_details"], output_dir),
+        plot_b1_02(frames["race_details"], output_dir),
+    ]
+    entries.extend(
+        plot_b1_03(frames["driver_standings"], frames["constructor_standings"], output_dir)
+    )
+    export_block1_data(
+        frames["race_details"],
+        frames["driver_standings"],
+        frames["constructor_standings"],
+        frames["starting_grids"],
+        docs_dir,
+        cube=frames["cube"],
+    )
+    return entries
+
+
+def _stage_b2(frames, output_dir, docs_dir):
+    race_details = frames["race_details"]
+    starting_grids = frames["starting_grids"]
+    bands = season_spearman_bands(race_details, starting_grids)
+    tensor = grid_transition_tensor(race_details, starting_grids)
+    entries = [
+        plot_b2_01(race_details, starting_grids, output_dir, bands=bands),
+        plot_b2_02(race_details, starting_grids, output_dir, tensor=tensor),
+        plot_b2_03(race_details, starting_grids, output_dir),
+    ]
+    export_block2_data(
+        race_details, starting_grids, docs_dir, bands=bands, tensor=tensor
+    )
+    return entries
+
+
+def _stage_b3(frames, output_dir, docs_dir):
+    pitstops = frames["pitstops"]
+    race_details = frames["race_details"]
+    entries = [
+        plot_b3_01(pitstops, race_details, output_dir),
+        plot_b3_02(pitstops, race_details, output_dir),
+        plot_b3_03(pitstops, output_dir, percentile=get_pit_percentile()),
+    ]
+    export_block3_data(pitstops, race_details, docs_dir, percentile=get_pit_percentile())
+    return entries
+
+
+def _stage_b4(frames, output_dir, docs_dir):
+    sprint_results = frames["sprint_results"]
+    driver_standings = frames["driver_standings"]
+    test = sprint_permutation_test(frames["race_details"], sprint_results)
+    simulation = sprint_title_simulation(frames["race_details"], sprint_results)
+    entries = [
+        plot_b4_01(sprint_results, driver_standings, output_dir),
+        plot_b4_02(
+            sprint_results, frames["sprint_grid"], frames["starting_grids"], output_dir
+        ),
+        plot_b4_03(frames["race_details"], sprint_results, output_dir, test=test),
+        plot_b4_04(sprint_results, driver_standings, output_dir),
+        plot_b4_05(
+            frames["race_details"], sprint_results, output_dir, simulation=simulation
+        ),
+    ]
+    export_block4_data(
+        frames["race_details"],
+        driver_standings,
+        frames["starting_grids"],
+        sprint_results,
+        frames["sprint_grid"],
+        docs_dir,
+        test=test,
+        simulation=simulation,
+    )
+    return entries
+
+
+def _stage_b5(frames, output_dir, docs_dir):
+    qualifyings = frames["qualifyings"]
+    entries = [
+        plot_b5_01(qualifyings, output_dir),
+        plot_b5_02(qualifyings, output_dir),
+        plot_b5_03(frames["practices"], frames["fastestlaps_detailed"], output_dir),
+    ]
+    fastestlaps_detailed = frames["fastestlaps_detailed"]
+    fastest_laps = frames["fastest_laps"]
+    driver_standings = frames["driver_standings"]
+    comparison = fastest_car_vs_champion(fastestlaps_detailed, fastest_laps, driver_standings)
+    entries.append(
+        plot_b5_04(
+            fastestlaps_detailed,
+            fastest_laps,
+            driver_standings,
+            output_dir,
+            comparison=comparison,
+        )
+    )
+    export_pace_data(
+        qualifyings, frames["practices"], frames["fastestlaps_detailed"], docs_dir
+    )
+    export_car_pace_data(
+        fastestlaps_detailed, fastest_laps, driver_standings, docs_dir, comparison=comparison
+    )
+    return entries
+
+
+def _stage_b6(frames, output_dir, docs_dir):
+    race_details = frames["race_details"]
+    qualifyings = frames["qualifyings"]
+    duels = head_to_head(race_details, qualifyings)
+    sprint_results = frames["sprint_results"]
+    ratings = frames["ratings"]
+    entries = [
+        plot_b6_01(race_details, qualifyings, output_dir, duels=duels),
+        plot_b6_02(race_details, sprint_results, output_dir, ratings=ratings),
+    ]
+    export_teammate_data(race_details, qualifyings, docs_dir, duels=duels)
+    export_rating_data(race_details, sprint_results, docs_dir, ratings=ratings)
+    export_similarity_data(race_details, frames["starting_grids"], docs_dir)
+    return entries
+
+
+def _stage_b7(frames, output_dir, docs_dir):
+    race_details = frames["race_details"]
+    driver_standings = frames["driver_standings"]
+    sprint_results = frames["sprint_results"]
+    fastest_laps = frames["fastest_laps"]
+    changes = title_changes(race_details, driver_standings, sprint_results, fastest_laps)
+    entries = [
+        plot_b7_01(
+            race_details,
+            driver_standings,
+            sprint_results,
+            fastest_laps,
+            output_dir,
+            changes=changes,
+        ),
+    ]
+    export_scoring_data(
+        race_details,
+        driver_standings,
+        sprint_results,
+        fastest_laps,
+        docs_dir,
+        changes=changes,
+    )
+    return entries
+
+
+def _stage_b8(frames, output_dir, docs_dir):
+    pitstops = frames["pitstops"]
+    race_details = frames["race_details"]
+    starting_grids = frames["starting_grids"]
+    strategy = reconstruct_stints(pitstops, race_details)
+    undercuts = undercut_pairs(pitstops, race_details, starting_grids, strategy=strategy)
+    entries = [
+        plot_b8_01(pitstops, race_details, output_dir, strategy=strategy),
+        plot_b8_02(pitstops, race_details, output_dir, strategy=strategy),
+        plot_b8_03(
+            pitstops,
+            race_details,
+            starting_grids,
+            output_dir,
+            strategy=strategy,
+            undercuts=undercuts,
+        ),
+    ]
+    export_strategy_data(
+        pitstops,
+        race_details,
+        starting_grids,
+        docs_dir,
+        strategy=strategy,
+        undercuts=undercuts,
+    )
+    return entries
+
+
+def _stage_careers(frames, output_dir, docs_dir):
+    index = CareerIndex.from_driver_details(frames["driver_details"])
+    export_driver_careers(index, docs_dir)
+    return []
+
+
+# Orden de ejecucion y dependencias de cada bloque (figuras B*_ y JSON b*_).
+STAGES = {
+    "B1": (
+        ["race_details", "driver_standings", "constructor_standings", "cube"],
+        _stage_b1,
+    ),
+    "B2": (["race_details", "starting_grids"], _stage_b2),
+    "B3": (["pitstops", "race_details"], _stage_b3),
+    "B4": (
+        [
+            "sprint_results",
+            "sprint_grid",
+            "starting_grids",
+            "race_details",
+            "driver_standings",
+        ],
+        _stage_b4,
+    ),
+    "B5": (
+        [
+            "qualifyings",
+            "practices",
+            "fastestlaps_detailed",
+            "fastest_laps",
+            "driver_standings",
+        ],
+        _stage_b5,
+    ),
+    "B6": (
+        ["race_details", "qualifyings", "sprint_results", "starting_grids", "ratings"],
+        _stage_b6,
+    ),
+    "B7": (
+        ["race_details", "driver_standings", "sprint_results", "fastest_laps"],
+        _stage_b7,
+    ),
+    "B8": (["pitstops", "race_details", "starting_grids"], _stage_b8),
+    "careers": (["driver_details"], _stage_careers),
+}
+
+
+# Variantes por entidad (small multiples) de figuras existentes; se generan
+# con --multiples en outputs/multiples/<figura>/.
+MULTIPLES = {
+    "B2_02": lambda frames, output_dir: render_b2_02_seasons(
+        frames["race_details"], frames["starting_grids"], output_dir
+    ),
+    "B3_01": lambda frames, output_dir: render_b3_01_teams(
+        frames["pitstops"], frames["race_details"], output_dir
+    ),
+}
+
+
+def run_multiples(frames, output_dir):
+    return {
+        name: runner(frames, Path(output_dir) / name)
+        for name, runner in MULTIPLES.items()
+    }
+
+
+def fingerprint(name):
+    filename, _ = DATASETS[name]
+    stat = (BASE_DIR / filename).stat()
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def load_frames(names, frames=None, backend="csv"):
+    # backend "sqlite": lee de outputs/f1.sqlite (reimporta las tablas
+    # cuyo CSV ha cambiado) en lugar de parsear los CSV.
+    frames = {} if frames is None else frames
+    specs = {name: DATASETS[name] for name in names}
+    frames.update(load_tables(specs) if backend == "sqlite" else load_csvs(specs))
+    return frames
+
+
+def refresh_derived(frames, changed, base_dir):
+    rebuilt = set()
+    for name, (inputs, builder) in DERIVED.items():
+        if name not in frames or changed.intersection(inputs):
+            frames[name] = builder(frames, base_dir)
+            rebuilt.add(name)
+    return rebuilt
+
+
+def affected_stages(changed):
+    return [
+        stage for stage, (deps, _) in STAGES.items() if changed.intersection(deps)
+    ]
+
+
+def run_stages(stages, frames, output_dir, docs_dir, manifest_by_stage):
+    for stage in stages:
+        _, runner = STAGES[stage]
+        manifest_by_stage[stage] = runner(frames, output_dir, docs_dir)
+    return manifest_by_stage
+
+
+def collect_manifest(manifest_by_stage):
+    entries = []
+    for stage in STAGES:
+        entries.extend(manifest_by_stage.get(stage, []))
+    return entries
@@ -1,8 +1,62 @@
 ﻿from datetime import datetime
 from pathlib import Path
+import re
+import time
+
 import matplotlib.pyplot as plt
 
 
+# directory: carpeta de outputs/ donde se escriben las figuras; publish:
+# si se sincronizan con docs/figures (los borradores nunca se publican).
+RENDER_PROFILES = {
+    "draft": {
+        "formats": ["png"],
+        "dpi": 72,
+        "bbox_inches": None,
+        "directory": "figures_draft",
+        "publish": False,
+    },
+    "publication": {
+        "formats": ["png"],
+        "dpi": 300,
+        "bbox_inches": "tight",
+        "directory": "figures",
+        "publish": True,
+    },
+    "web": {
+        "formats": ["webp", "svg"],
+        "dpi": 120,
+        "bbox_inches": "tight",
+        "directory": "figures",
+        "publish": True,
+    },
+}
+DEFAULT_PROFILE = "publication"
+
+_active_profile = DEFAULT_PROFILE
+
+
+def set_render_profile(name):
+    global _active_profile
+    if name not in RENDER_PROFILES:
+        raise ValueError(
+            f"Perfil de render desconocido: {name} "
+            f"(disponibles: {', '.join(RENDER_PROFILES)})"
+        )
+    _active_profile = name
+
+
+def get_render_profile():
+    return _active_profile
+
+
+def output_suffixes():
+    suffixes = set()
+    for profile in RENDER_PROFILES.values():
+        suffixes.update(f".{fmt}" for fmt in profile["formats"])
+    return sorted(suffixes)
+
+
 def add_footer(fig, datasets, note=None):
     parts = [f"Fuente: {datasets}"]
     if note:
@@ -17,17 +71,65 @@ def add_footer(fig, datasets, note=None):
     )
 
 
-def save_figure(fig, output_dir, filename, title, datasets, filters, note=None):
+def save_figure(
+    fig, output_dir, filename, title, datasets, filters, note=None, profile=None
+):
+    profile = profile or _active_profile
+    settings = RENDER_PROFILES[profile]
     add_footer(fig, datasets, note)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    path = output_dir / filename
-    fig.savefig(path, dpi=300, bbox_inches="tight")
+
+    paths = [
+        output_dir / Path(filename).with_suffix(f".{fmt}").name
+        for fmt in settings["formats"]
+    ]
+    start = time.perf_counter()
+    for path in paths:
+        fig.savefig(path, dpi=settings["dpi"], bbox_inches=settings["bbox_inches"])
+    elapsed = time.perf_counter() - start
     plt.close(fig)
     return {
-        "filename": filename,
+        "filename": paths[0].name,
         "title": title,
         "datasets": datasets,
         "filters": filters,
         "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "profile": profile,
+        "formats": ";".join(settings["formats"]),
+        "render_seconds": round(elapsed, 3),
+        "bytes": sum(path.stat().st_size for path in paths),
+    }
+
+
+def render_multiples(fig, items, update, output_dir, filename, datasets, note=None, profile=None):
+    # Small multiples: la figura y sus artistas se crean una sola vez y para
+    # cada elemento `update(key, data)` solo cambia datos y textos antes de
+    # guardar. filename lleva "{key}", p. ej. "B2_02_{key}.png"; la clave se
+    # normaliza para que sirva como nombre de archivo.
+    profile = profile or _active_profile
+    settings = RENDER_PROFILES[profile]
+    add_footer(fig, datasets, note)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    images = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    for key, data in items:
+        update(key, data)
+        for fmt in settings["formats"]:
+            name = filename.format(key=re.sub(r"[^A-Za-z0-9]+", "_", str(key)).strip("_"))
+            path = output_dir / Path(name).with_suffix(f".{fmt}").name
+            fig.savefig(path, dpi=settings["dpi"], bbox_inches=settings["bbox_inches"])
+            total_bytes += path.stat().st_size
+        images += 1
+    elapsed = time.perf_counter() - start
+    plt.close(fig)
+    return {
+        "images": images,
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(images / elapsed, 1) if elapsed > 0 else 0.0,
+        "bytes": total_bytes,
+        "profile": profile,
     }
@@ -1,7 +1,7 @@
 ﻿import numpy as np
 import matplotlib.pyplot as plt
 
-from src.cleaning import add_decade, add_finish_pos, to_numeric
+from src.cleaning import add_decade, add_finish_pos, own, to_numeric
 from src.plot_utils import save_figure
 
 
@@ -11,7 +11,7 @@ TITLE_B1_03 = "BLOQUE 1 - Barras de continuidad: títulos consecutivos"
 
 
 def plot_b1_01(race_details, output_dir):
-    df = race_details.copy()
+    df = own(race_details)
     df["Year"] = to_numeric(df["Year"])
     df = df.dropna(subset=["Year", "Grand Prix", "Car"])
     df["Year"] = df["Year"].astype(int)
@@ -41,7 +41,7 @@ def plot_b1_01(race_details, output_dir):
 
 
 def plot_b1_02(race_details, output_dir):
-    df = race_details.copy()
+    df = own(race_details)
     df = add_finish_pos(df, "Pos")
     df = df[df["FinishPos"] == 1]
     df = add_decade(df, "Year")
@@ -103,7 +103,7 @@ def _max_consecutive_years(years):
 
 
 def _compute_streaks(df, entity_col):
-    df = df.copy()
+    df = own(df)
     df["Year"] = to_numeric(df["Year"])
     df["PosNum"] = to_numeric(df["Pos"])
     df = df[(df["PosNum"] == 1) & df["Year"].notna()]
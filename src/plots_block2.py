@@ -1,15 +1,10 @@
 ﻿import numpy as np
 import matplotlib.pyplot as plt
 
-from src.cleaning import (
-    add_decade,
-    add_driver_key,
-    add_finish_pos,
-    add_grid_pos,
-    spearman_corr,
-    to_numeric,
-)
-from src.plot_utils import save_figure
+from src.cleaning import add_decade, merge_race_grid, spearman_corr
+from src.plot_utils import render_multiples, save_figure
+from src.stats import season_spearman_bands
+from src.transitions import TransitionTensor, grid_transition_tensor
 
 try:
     from scipy.stats import spearmanr
@@ -23,24 +18,6 @@ TITLE_B2_02 = "BLOQUE 2 - Probabilidad de podio según posición de salida (por
 TITLE_B2_03 = "BLOQUE 2 - Boxplot de posiciones ganadas/perdidas por década"
 
 
-def _merge_race_grid(race_details, starting_grids):
-    race = add_driver_key(add_finish_pos(race_details, "Pos"))
-    grid = add_driver_key(add_grid_pos(starting_grids, "Pos"))
-
-    race["Year"] = to_numeric(race["Year"])
-    grid["Year"] = to_numeric(grid["Year"])
-
-    race = race.dropna(subset=["Year", "Grand Prix", "DriverKey"])
-    grid = grid.dropna(subset=["Year", "Grand Prix", "DriverKey"])
-
-    merged = race.merge(
-        grid[["Year", "Grand Prix", "DriverKey", "GridPos"]],
-        on=["Year", "Grand Prix", "DriverKey"],
-        how="inner",
-    )
-    return merged
-
-
 def _spearman(x, y):
     if _HAS_SCIPY:
         value, _ = spearmanr(x, y, nan_policy="omit")
@@ -48,9 +25,11 @@ def _spearman(x, y):
     return spearman_corr(x, y)
 
 
-def plot_b2_01(race_details, starting_grids, output_dir):
-    merged = _merge_race_grid(race_details, starting_grids)
+def plot_b2_01(race_details, starting_grids, output_dir, bands=None):
+    merged = merge_race_grid(race_details, starting_grids)
     merged = merged.dropna(subset=["FinishPos", "GridPos"])
+    if bands is None:
+        bands = season_spearman_bands(race_details, starting_grids)
 
     rows = []
     for year, group in merged.groupby("Year"):
@@ -63,8 +42,18 @@ def plot_b2_01(race_details, starting_grids, output_dir):
     rhos = [item[1] for item in rows]
 
     fig, ax = plt.subplots(figsize=(10, 5))
+    if not bands.empty:
+        bands = bands.sort_values("Year")
+        ax.fill_between(
+            bands["Year"],
+            bands["ci_low"],
+            bands["ci_high"],
+            alpha=0.3,
+            label="IC 95% bootstrap",
+        )
     if rows:
-        ax.plot(years, rhos)
+        ax.plot(years, rhos, label="Rho")
+        ax.legend()
     ax.set_xlabel("Año")
     ax.set_ylabel("Rho (Spearman)")
     ax.set_title(TITLE_B2_01)
@@ -76,24 +65,20 @@ def plot_b2_01(race_details, starting_grids, output_dir):
         TITLE_B2_01,
         "race_details.csv, starting_grids.csv",
         "Excluye DNFs (posición final no numérica)",
-        note="Excluye DNFs",
+        note="Excluye DNFs; banda = IC 95% remuestreando carreras de cada temporada",
     )
 
 
-def plot_b2_02(race_details, starting_grids, output_dir):
-    merged = _merge_race_grid(race_details, starting_grids)
-    merged = merged.dropna(subset=["FinishPos", "GridPos"])
-    merged = add_decade(merged, "Year")
-    merged["Podium"] = merged["FinishPos"] <= 3
+def plot_b2_02(race_details, starting_grids, output_dir, tensor=None):
+    if tensor is None:
+        tensor = grid_transition_tensor(race_details, starting_grids)
+    podium = tensor.top_k(3)
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    for decade, group in merged.groupby("Decade"):
-        prob = (
-            group.groupby("GridPos")["Podium"].mean().reset_index()
-        )
-        prob = prob.dropna(subset=["GridPos"])
-        if not prob.empty:
-            ax.plot(prob["GridPos"], prob["Podium"], label=str(int(decade)))
+    for i, decade in enumerate(tensor.decades):
+        slots = tensor.grid_slots(i)
+        if len(slots):
+            ax.plot(slots, podium[i, slots], label=str(int(decade)))
 
     ax.set_xlabel("Posición de salida")
     ax.set_ylabel("Probabilidad de podio")
@@ -111,8 +96,44 @@ def plot_b2_02(race_details, starting_grids, output_dir):
     )
 
 
+def render_b2_02_seasons(race_details, starting_grids, output_dir):
+    # Una curva de probabilidad de podio por temporada (B2_02 por año).
+    tensor = TransitionTensor.from_merged(
+        merge_race_grid(race_details, starting_grids), period="Year"
+    )
+    podium = tensor.top_k(3)
+    items = [
+        (int(year), tensor.grid_slots(i))
+        for i, year in enumerate(tensor.decades)
+        if len(tensor.grid_slots(i))
+    ]
+    rows = {int(year): i for i, year in enumerate(tensor.decades)}
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    (line,) = ax.plot([], [], marker="o")
+    ax.set_xlim(0.5, tensor.counts.shape[1] - 0.5)
+    ax.set_ylim(0, 1)
+    ax.set_xlabel("Posición de salida")
+    ax.set_ylabel("Probabilidad de podio")
+    title = ax.set_title("")
+
+    def update(year, slots):
+        line.set_data(slots, podium[rows[year], slots])
+        title.set_text(f"BLOQUE 2 - Probabilidad de podio según posición de salida - {year}")
+
+    return render_multiples(
+        fig,
+        items,
+        update,
+        output_dir,
+        "B2_02_prob_podio_grid_{key}.png",
+        "race_details.csv, starting_grids.csv",
+        note="Excluye DNFs",
+    )
+
+
 def plot_b2_03(race_details, starting_grids, output_dir):
-    merged = _merge_race_grid(race_details, starting_grids)
+    merged = merge_race_grid(race_details, starting_grids)
     merged = merged.dropna(subset=["FinishPos", "GridPos"])
     merged = add_decade(merged, "Year")
     merged["Delta"] = merged["FinishPos"] - merged["GridPos"]
@@ -1,8 +1,9 @@
 ﻿import numpy as np
 import matplotlib.pyplot as plt
 
-from src.cleaning import add_decade, add_driver_key, add_finish_pos, to_numeric
-from src.plot_utils import save_figure
+from src.cleaning import add_decade, add_driver_key, add_finish_pos, own, to_numeric
+from src.plot_utils import render_multiples, save_figure
+from src.stats import grouped_quantile_flags, quantile_label
 
 try:
     import statsmodels.api as sm
@@ -42,7 +43,7 @@ def _merge_pit_race(pitstops, race_details):
     race = race.dropna(subset=["FinishPos", "Year", "Grand Prix", "DriverKey"])
 
     merged = pit_agg.merge(
-        race[["Year", "Grand Prix", "DriverKey", "FinishPos"]],
+        race[["Year", "Grand Prix", "DriverKey", "FinishPos", "Car"]],
         on=["Year", "Grand Prix", "DriverKey"],
         how="inner",
     )
@@ -78,6 +79,44 @@ def plot_b3_01(pitstops, race_details, output_dir):
     )
 
 
+def render_b3_01_teams(pitstops, race_details, output_dir, min_points=10):
+    # B3_01 para cada equipo con al menos min_points carreras con paradas.
+    merged = _merge_pit_race(pitstops, race_details).dropna(subset=["Car"])
+    teams = merged.groupby("Car")
+    items = [
+        (team, (part["total_pit_time"].to_numpy(), part["FinishPos"].to_numpy()))
+        for team, part in teams
+        if len(part) >= min_points
+    ]
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    points = ax.scatter([], [])
+    (trend,) = ax.plot([], [], color="C1")
+    ax.set_xlabel("Tiempo total en boxes (s)")
+    ax.set_ylabel("Posición final")
+    title = ax.set_title("")
+
+    def update(team, data):
+        x, y = data
+        points.set_offsets(np.column_stack([x, y]))
+        slope, intercept = np.polyfit(x, y, 1)
+        x_line = np.array([x.min(), x.max()])
+        trend.set_data(x_line, slope * x_line + intercept)
+        margin = (x.max() - x.min()) * 0.05 or 1
+        ax.set_xlim(x.min() - margin, x.max() + margin)
+        ax.set_ylim(0, y.max() + 1)
+        title.set_text(f"BLOQUE 3 - Tiempo en boxes vs posición final - {team}")
+
+    return render_multiples(
+        fig,
+        items,
+        update,
+        output_dir,
+        "B3_01_pit_time_vs_pos_{key}.png",
+        "pitstops.csv, race_details.csv",
+    )
+
+
 def plot_b3_02(pitstops, race_details, output_dir):
     merged = _merge_pit_race(pitstops, race_details)
     merged = add_decade(merged, "Year")
@@ -140,18 +179,16 @@ def plot_b3_02(pitstops, race_details, output_dir):
     )
 
 
-def plot_b3_03(pitstops, output_dir):
-    pit = pitstops.copy()
+def plot_b3_03(pitstops, output_dir, percentile=0.95):
+    pit = own(pitstops)
     pit["Year"] = to_numeric(pit["Year"])
     pit_time_col = _pit_time_column(pit)
     pit["PitTime"] = to_numeric(pit[pit_time_col])
     pit = pit.dropna(subset=["PitTime", "Year"])
 
-    thresholds = pit.groupby("Year")["PitTime"].quantile(0.95)
-    pit = pit.merge(
-        thresholds.rename("P95"), left_on="Year", right_index=True, how="left"
-    )
-    severe = pit[pit["PitTime"] > pit["P95"]]
+    flags, _ = grouped_quantile_flags(pit, "PitTime", {"season": ["Year"]}, [percentile])
+    label = quantile_label(percentile)
+    severe = pit[flags[f"season_{label}"]]
 
     fig, ax = plt.subplots(figsize=(10, 6))
     if not severe.empty:
@@ -160,12 +197,13 @@ def plot_b3_03(pitstops, output_dir):
     ax.set_ylabel("Frecuencia")
     ax.set_title(TITLE_B3_03)
 
+    note = f"Error grave = parada > {label} de su temporada"
     return save_figure(
         fig,
         output_dir,
         "B3_03_distribucion_errores_graves.png",
         TITLE_B3_03,
         "pitstops.csv",
-        "Error grave = parada > p95 de su temporada",
-        note="Error grave = parada > p95 de su temporada",
+        note,
+        note=note,
     )
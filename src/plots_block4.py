@@ -1,23 +1,26 @@
 ﻿import numpy as np
 import matplotlib.pyplot as plt
 
-from src.cleaning import add_decade, add_driver_key, add_finish_pos, to_numeric
+from src.cleaning import add_decade, add_driver_key, own, to_numeric
 from src.plot_utils import save_figure
+from src.simulation import sprint_title_simulation
+from src.stats import race_top10_variance, sprint_permutation_test
 
 
 TITLE_B4_01 = "BLOQUE 4 - % de puntos del mundial procedentes del sprint"
 TITLE_B4_02 = "BLOQUE 4 - Cambios de posición inducidos por el sprint"
 TITLE_B4_03 = "BLOQUE 4 - Imprevisibilidad: sprint vs no sprint"
 TITLE_B4_04 = "BLOQUE 4 - Sprint y campeonatos decididos"
+TITLE_B4_05 = "BLOQUE 4 - Probabilidad de título con y sin sprint (Monte Carlo)"
 
 
 def plot_b4_01(sprint_results, driver_standings, output_dir):
-    sprint = sprint_results.copy()
+    sprint = own(sprint_results)
     sprint["Year"] = to_numeric(sprint["Year"])
     sprint["PTS"] = to_numeric(sprint["PTS"])
     sprint = sprint.dropna(subset=["Year", "PTS"])
 
-    standings = driver_standings.copy()
+    standings = own(driver_standings)
     standings["Year"] = to_numeric(standings["Year"])
     standings["PTS"] = to_numeric(standings["PTS"])
     standings = standings.dropna(subset=["Year", "PTS"])
@@ -98,27 +101,10 @@ def plot_b4_02(sprint_results, sprint_grid, starting_grids, output_dir):
     )
 
 
-def plot_b4_03(race_details, sprint_results, output_dir):
-    race = add_finish_pos(race_details, "Pos")
-    race["Year"] = to_numeric(race["Year"])
-    race = race.dropna(subset=["Year", "Grand Prix", "FinishPos"])
-    race = race[race["FinishPos"] <= 10]
-
-    variance = (
-        race.groupby(["Year", "Grand Prix"])["FinishPos"]
-        .var()
-        .reset_index()
-    )
-
-    sprint_keys = sprint_results[["Year", "Grand Prix"]].drop_duplicates()
-    sprint_keys["Year"] = to_numeric(sprint_keys["Year"])
-    sprint_set = set(
-        tuple(x) for x in sprint_keys[["Year", "Grand Prix"]].dropna().values
-    )
-
-    variance["Sprint"] = variance.apply(
-        lambda row: (row["Year"], row["Grand Prix"]) in sprint_set, axis=1
-    )
+def plot_b4_03(race_details, sprint_results, output_dir, test=None):
+    variance = race_top10_variance(race_details, sprint_results)
+    if test is None:
+        test = sprint_permutation_test(race_details, sprint_results)
 
     data = [
         variance.loc[variance["Sprint"], "FinishPos"].dropna().values,
@@ -128,10 +114,28 @@ def plot_b4_03(race_details, sprint_results, output_dir):
     fig, ax = plt.subplots(figsize=(8, 5))
     if any(len(d) > 0 for d in data):
         ax.boxplot(data, labels=["Con sprint", "Sin sprint"])
+    if test:
+        cohen_d = "n/d" if test["cohen_d"] is None else f"{test['cohen_d']:.2f}"
+        ax.text(
+            0.02,
+            0.98,
+            (
+                f"Permutación ({test['n_perm']}): p = {test['p_value']:.3f}\n"
+                f"Δ media = {test['mean_diff']:.2f}; d = {cohen_d}; "
+                f"δ Cliff = {test['cliffs_delta']:.2f}"
+            ),
+            transform=ax.transAxes,
+            ha="left",
+            va="top",
+            fontsize=8,
+        )
     ax.set_ylabel("Varianza de posiciones top-10")
     ax.set_title(TITLE_B4_03)
 
-    note = "Carrera con sprint = aparece en sprint_results.csv"
+    note = (
+        "Carrera con sprint = aparece en sprint_results.csv; "
+        "p-valor bilateral barajando la etiqueta sprint entre carreras"
+    )
 
     return save_figure(
         fig,
@@ -210,3 +214,37 @@ def plot_b4_04(sprint_results, driver_standings, output_dir):
         "Pos=1 vs Pos=2; puntos sprint por piloto",
         note=note,
     )
+
+
+def plot_b4_05(race_details, sprint_results, output_dir, simulation=None, top=3):
+    if simulation is None:
+        simulation = sprint_title_simulation(race_details, sprint_results)
+    summary, probabilities = simulation
+
+    fig, axes = plt.subplots(1, max(len(summary), 1), figsize=(10, 5), squeeze=False)
+    for ax, season in zip(axes[0], summary.itertuples(index=False)):
+        season_probs = probabilities[probabilities["Year"] == season.Year]
+        leaders = season_probs.nlargest(top, "p_with_sprint")
+        x = np.arange(len(leaders))
+        ax.bar(x - 0.2, leaders["p_with_sprint"] * 100, width=0.4, label="Con sprint")
+        ax.bar(x + 0.2, leaders["p_without_sprint"] * 100, width=0.4, label="Sin sprint")
+        ax.set_xticks(x)
+        ax.set_xticklabels(leaders["Driver"], rotation=20, ha="right", fontsize=8)
+        ax.set_ylim(0, 100)
+        ax.set_title(f"{season.Year}: cambia el campeón en {season.flip_rate * 100:.1f}%", fontsize=10)
+    axes[0][0].set_ylabel("% de temporadas simuladas ganadas")
+    if not summary.empty:
+        axes[0][0].legend(fontsize=8)
+    fig.suptitle(TITLE_B4_05)
+    fig.subplots_adjust(bottom=0.25)
+
+    n_sims = int(summary["n_sims"].iloc[0]) if not summary.empty else 0
+    return save_figure(
+        fig,
+        output_dir,
+        "B4_05_simulacion_sprint.png",
+        TITLE_B4_05,
+        "race_details.csv, sprint_results.csv",
+        f"{n_sims} temporadas simuladas por año; titulares (>= 50% de carreras)",
+        note="Cada resultado se remuestrea de las posiciones del piloto en esa temporada",
+    )
@@ -0,0 +1,129 @@
+﻿import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+
+from src.pace import (
+    fastest_car_vs_champion,
+    gap_to_pole,
+    practice_race_correlation,
+    practice_race_pace,
+    qualifying_progression,
+)
+from src.plot_utils import save_figure
+
+
+TITLE_B5_01 = "BLOQUE 5 - Diferencia con la pole por temporada"
+TITLE_B5_02 = "BLOQUE 5 - Progresión de tiempos Q1 → Q2 → Q3"
+TITLE_B5_03 = "BLOQUE 5 - Ritmo en libres vs vuelta rápida en carrera"
+TITLE_B5_04 = "BLOQUE 5 - Coche más rápido vs coche del campeón"
+
+
+def plot_b5_01(qualifyings, output_dir):
+    gaps = gap_to_pole(qualifyings)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if not gaps.empty:
+        ax.plot(gaps["Year"], gaps["median_gap"], label="Mediana de la parrilla")
+        ax.plot(gaps["Year"], gaps["pole_margin"], label="Margen de la pole (P2)")
+        ax.legend()
+    ax.set_xlabel("Año")
+    ax.set_ylabel("% sobre el tiempo de la pole")
+    ax.set_title(TITLE_B5_01)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B5_01_gap_pole.png",
+        TITLE_B5_01,
+        "qualifyings.csv",
+        "Mejor tiempo por piloto (Q1/Q2/Q3/Time); carreras con al menos 2 tiempos",
+    )
+
+
+def plot_b5_02(qualifyings, output_dir):
+    progression = qualifying_progression(qualifyings)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if not progression.empty:
+        ax.plot(progression["Year"], progression["q1_q2"], marker="o", label="Q1 → Q2")
+        ax.plot(progression["Year"], progression["q2_q3"], marker="o", label="Q2 → Q3")
+        ax.axhline(0, color="gray", linewidth=0.8)
+        ax.legend()
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Variación mediana del tiempo (%)")
+    ax.set_title(TITLE_B5_02)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B5_02_progresion_q1_q2_q3.png",
+        TITLE_B5_02,
+        "qualifyings.csv",
+        "Pilotos con tiempo en ambas sesiones; valores negativos = mejora",
+    )
+
+
+def plot_b5_03(practices, fastestlaps_detailed, output_dir):
+    pace = practice_race_pace(practices, fastestlaps_detailed)
+    corr = practice_race_correlation(pace)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if not corr.empty:
+        ax.plot(corr["Year"], corr["rho"], marker="o")
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Rho (Spearman)")
+    ax.set_ylim(-1, 1)
+    ax.set_title(TITLE_B5_03)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B5_03_ritmo_libres_carrera.png",
+        TITLE_B5_03,
+        "practices.csv, fastestlaps_detailed.csv",
+        "Gap % al mejor tiempo del fin de semana en libres vs gap % en vuelta rápida",
+        note="Mejor vuelta de libres (todas las sesiones) por piloto y carrera",
+    )
+
+
+def plot_b5_04(fastestlaps_detailed, fastest_laps, driver_standings, output_dir, comparison=None):
+    if comparison is None:
+        comparison = fastest_car_vs_champion(fastestlaps_detailed, fastest_laps, driver_standings)
+
+    fig, (ax_same, ax) = plt.subplots(
+        2, 1, figsize=(11, 6), sharex=True, gridspec_kw={"height_ratios": [1, 3]}
+    )
+    if not comparison.empty:
+        years = comparison["Year"].to_numpy()
+        colors = ["C2" if same else "C3" for same in comparison["same_car"]]
+        hatches = ["//" if method != "ritmo" else "" for method in comparison["method"]]
+        bars = ax_same.bar(years, 1, width=0.9, color=colors)
+        for bar, hatch in zip(bars, hatches):
+            bar.set_hatch(hatch)
+        ax_same.legend(
+            handles=[
+                Patch(color="C2", label="Campeón con el coche más rápido"),
+                Patch(color="C3", label="Campeón con otro coche"),
+                Patch(facecolor="white", edgecolor="black", hatch="//", label="Por nº de vueltas rápidas"),
+            ],
+            loc="lower center",
+            bbox_to_anchor=(0.5, 1.0),
+            ncol=3,
+            fontsize=8,
+            frameon=False,
+        )
+        ax.bar(years, comparison["champion_gap"], width=0.8, color="C3")
+    ax_same.set_yticks([])
+    ax_same.set_title(TITLE_B5_04, pad=24)
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Desventaja del coche del campeón\n(% de ritmo, mediana)")
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B5_04_coche_rapido_vs_campeon.png",
+        TITLE_B5_04,
+        "fastestlaps_detailed.csv, fastest_laps.csv, driver_standings.csv",
+        "Ritmo = mediana por temporada del % sobre la mejor vuelta rápida de cada carrera; "
+        "equipos en >= 50% de las carreras",
+        note="Antes de 1983 solo consta la vuelta rápida de cada carrera",
+    )
@@ -0,0 +1,68 @@
+﻿import numpy as np
+import matplotlib.pyplot as plt
+
+from src.plot_utils import save_figure
+from src.ratings import EloRatings
+from src.teammates import MIN_DUELS, career_tallies, head_to_head, ranked_careers
+
+
+TITLE_B6_01 = "BLOQUE 6 - Duelos contra el compañero de equipo"
+TITLE_B6_02 = "BLOQUE 6 - Evolución del rating Elo de los pilotos"
+
+
+def plot_b6_01(race_details, qualifyings, output_dir, duels=None):
+    if duels is None:
+        duels = head_to_head(race_details, qualifyings)
+    ranked = ranked_careers(career_tallies(duels))
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    if not ranked.empty:
+        y = np.arange(len(ranked))
+        ax.barh(y - 0.2, ranked["race_pct"], height=0.4, label="Carrera")
+        ax.barh(y + 0.2, ranked["qualifying_pct"], height=0.4, label="Clasificación")
+        ax.set_yticks(y)
+        ax.set_yticklabels(ranked["Driver"])
+        ax.invert_yaxis()
+        ax.axvline(50, color="gray", linewidth=0.8, linestyle="--")
+        ax.legend(loc="lower right")
+    ax.set_xlabel("% de duelos ganados al compañero")
+    ax.set_xlim(0, 100)
+    ax.set_title(TITLE_B6_01)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B6_01_duelos_companero.png",
+        TITLE_B6_01,
+        "race_details.csv, qualifyings.csv",
+        f"Compañeros = mismo (Year, Grand Prix, Car); ambos clasificados; >= {MIN_DUELS} duelos",
+        note="20 pilotos con más duelos en carrera, ordenados por % en carrera",
+    )
+
+
+def plot_b6_02(race_details, sprint_results, output_dir, ratings=None, top=8):
+    if ratings is None:
+        ratings = EloRatings.from_frames(race_details, sprint_results)
+    leaders = ratings.table().head(top)["Driver"].tolist()
+    history = ratings.history()
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    for driver in leaders:
+        rows = history[history["Driver"] == driver]
+        ax.plot(rows["Season"], rows["Rating"], linewidth=1.2, label=driver)
+    ax.axhline(ratings.initial, color="gray", linewidth=0.8, linestyle="--")
+    if leaders:
+        ax.legend(fontsize=8)
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Rating Elo")
+    ax.set_title(TITLE_B6_02)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B6_02_rating_elo.png",
+        TITLE_B6_02,
+        "race_details.csv, sprint_results.csv",
+        f"K={ratings.k:g}; sprint con peso {ratings.sprint_weight:g}; no clasificados empatan al final",
+        note=f"{top} pilotos con mayor rating máximo",
+    )
@@ -0,0 +1,37 @@
+﻿import numpy as np
+import matplotlib.pyplot as plt
+
+from src.plot_utils import save_figure
+from src.scoring import POINTS_SCHEMES, title_changes
+
+
+TITLE_B7_01 = "BLOQUE 7 - Títulos que cambian de manos con otro sistema de puntos"
+
+
+def plot_b7_01(race_details, driver_standings, sprint_results, fastest_laps, output_dir, changes=None):
+    if changes is None:
+        changes = title_changes(race_details, driver_standings, sprint_results, fastest_laps)
+    table, changed = changes
+    counts = changed.sum()
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if not counts.empty:
+        y = np.arange(len(counts))
+        ax.barh(y, counts.values)
+        ax.set_yticks(y)
+        ax.set_yticklabels(counts.index)
+        ax.invert_yaxis()
+        for i, value in enumerate(counts.values):
+            ax.text(value, i, f" {int(value)}", va="center")
+    ax.set_xlabel(f"Títulos distintos al oficial (de {len(table)} temporadas)")
+    ax.set_title(TITLE_B7_01)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B7_01_sistemas_puntos.png",
+        TITLE_B7_01,
+        "race_details.csv, sprint_results.csv, fastest_laps.csv, driver_standings.csv",
+        f"{len(POINTS_SCHEMES)} sistemas aplicados a todas las temporadas; sin descartes de resultados",
+        note="Empates resueltos por victorias, segundos puestos, etc.",
+    )
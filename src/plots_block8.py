@@ -0,0 +1,154 @@
+﻿import numpy as np
+import matplotlib.pyplot as plt
+
+from src.plot_utils import save_figure
+from src.strategy import (
+    REFUEL_BAN,
+    RIVAL_GRID_GAP,
+    STRATEGIES,
+    UNDERCUT_WINDOW,
+    reconstruct_stints,
+    strategy_shares,
+    undercut_pairs,
+    undercut_summary,
+)
+
+
+TITLE_B8_01 = "BLOQUE 8 - Estrategias de paradas por temporada"
+TITLE_B8_02 = "BLOQUE 8 - Posición final según la estrategia"
+TITLE_B8_03 = "BLOQUE 8 - Undercut: ¿adelanta quien para antes?"
+
+
+def plot_b8_01(pitstops, race_details, output_dir, strategy=None):
+    if strategy is None:
+        strategy = reconstruct_stints(pitstops, race_details)
+    shares = strategy_shares(strategy[1])
+
+    fig, (ax, ax_stint) = plt.subplots(
+        2, 1, figsize=(10, 7), sharex=True, gridspec_kw={"height_ratios": [3, 1]}
+    )
+    if not shares.empty:
+        years = shares.index.to_numpy()
+        ax.stackplot(years, (shares[STRATEGIES] * 100).T.to_numpy(), labels=STRATEGIES)
+        ax.axvline(REFUEL_BAN - 0.5, color="black", linewidth=0.8, linestyle="--")
+        ax.legend(
+            loc="lower center",
+            bbox_to_anchor=(0.5, 1.0),
+            fontsize=8,
+            ncol=len(STRATEGIES),
+            frameon=False,
+        )
+        ax_stint.plot(years, shares["median_stint"], marker="o", markersize=3)
+    ax.set_ylabel("% de pilotos clasificados")
+    ax.set_ylim(0, 100)
+    ax.set_title(TITLE_B8_01, pad=24)
+    ax_stint.set_ylabel("Vueltas por stint\n(mediana)")
+    ax_stint.set_xlabel("Año")
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B8_01_estrategias_temporada.png",
+        TITLE_B8_01,
+        "pitstops.csv, race_details.csv",
+        "Solo pilotos clasificados en carreras con datos de paradas (1994+); "
+        "sin stints de 0 vueltas",
+        note=f"Línea discontinua: prohibición del repostaje ({REFUEL_BAN})",
+    )
+
+
+def plot_b8_02(pitstops, race_details, output_dir, strategy=None):
+    if strategy is None:
+        strategy = reconstruct_stints(pitstops, race_details)
+    classified = strategy[1].dropna(subset=["FinishPos"])
+    eras = [
+        ("Con repostaje", classified[classified["Year"] < REFUEL_BAN]),
+        ("Sin repostaje", classified[classified["Year"] >= REFUEL_BAN]),
+    ]
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    x = np.arange(len(STRATEGIES))
+    for i, (label, part) in enumerate(eras):
+        values = [part.loc[part["Strategy"] == name, "FinishPos"].to_numpy() for name in STRATEGIES]
+        keep = [j for j, v in enumerate(values) if len(v)]
+        if not keep:
+            continue
+        boxes = ax.boxplot(
+            [values[j] for j in keep],
+            positions=x[keep] + (i - 0.5) * 0.35,
+            widths=0.3,
+            patch_artist=True,
+            showfliers=False,
+            medianprops={"color": "black"},
+        )
+        for patch in boxes["boxes"]:
+            patch.set_facecolor(f"C{i}")
+            patch.set_alpha(0.6)
+        ax.plot([], [], color=f"C{i}", linewidth=6, alpha=0.6, label=label)
+    ax.set_xticks(x)
+    ax.set_xticklabels(STRATEGIES)
+    ax.invert_yaxis()
+    ax.legend()
+    ax.set_xlabel("Estrategia")
+    ax.set_ylabel("Posición final")
+    ax.set_title(TITLE_B8_02)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B8_02_estrategia_vs_posicion.png",
+        TITLE_B8_02,
+        "pitstops.csv, race_details.csv",
+        "Solo pilotos clasificados; número de paradas distintas por carrera",
+        note="Sin valores atípicos",
+    )
+
+
+def plot_b8_03(pitstops, race_details, starting_grids, output_dir, strategy=None, undercuts=None):
+    if undercuts is None:
+        undercuts = undercut_pairs(pitstops, race_details, starting_grids, strategy=strategy)
+    summary = undercut_summary(undercuts)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    offsets = np.arange(1, UNDERCUT_WINDOW + 1)
+    labels = {"companero": "Compañero de equipo", "rival": "Rival cercano en parrilla"}
+    for i, (relation, label) in enumerate(labels.items()):
+        rows = summary[summary["Relation"] == relation].set_index("Offset").reindex(offsets)
+        x = offsets + (i - 0.5) * 0.4
+        bars = ax.bar(x, rows["rate"].fillna(0) * 100, width=0.4, label=label, color=f"C{i}")
+        ax.scatter(
+            x,
+            rows["ahead_rate"] * 100,
+            marker="_",
+            s=200,
+            color="black",
+            zorder=3,
+            label="Termina delante (todos los pares)" if i == 0 else None,
+        )
+        for bar, count in zip(bars, rows["behind"].fillna(0).astype(int)):
+            ax.annotate(
+                f"n={count}",
+                (bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                ha="center",
+                va="bottom",
+                fontsize=7,
+            )
+    ax.axhline(50, color="gray", linewidth=0.8, linestyle="--")
+    ax.set_xticks(offsets)
+    ax.set_xlabel("Vueltas de adelanto en la parada")
+    ax.set_ylabel("% en que adelanta quien para antes\n(saliendo detrás)")
+    ax.set_ylim(0, 100)
+    ax.legend()
+    ax.set_title(TITLE_B8_03)
+
+    return save_figure(
+        fig,
+        output_dir,
+        "B8_03_undercut.png",
+        TITLE_B8_03,
+        "pitstops.csv, race_details.csv, starting_grids.csv",
+        f"Misma parada (1.ª, 2.ª...) con 1-{UNDERCUT_WINDOW} vueltas de diferencia; ambos clasificados; "
+        f"rival = otro coche a <= {RIVAL_GRID_GAP} puestos en parrilla; "
+        "éxito = salió detrás en parrilla y termina delante; n = pares en que sale detrás",
+        note="Sin posiciones vuelta a vuelta: orden previo = parrilla",
+    )
@@ -0,0 +1,193 @@
+﻿from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import own, to_numeric
+
+
+EVENT_KEYS = ["Year", "Grand Prix", "Kind"]
+
+
+def _rows_hash(events):
+    # Suma de hashes por fila: no depende del orden y se puede acumular.
+    hashes = pd.util.hash_pandas_object(events, index=False).to_numpy()
+    return int(hashes.sum(dtype=np.uint64))
+
+
+def race_events(race_details, sprint_results=None):
+    # Carreras (y sprints) en orden cronologico: por año y, dentro del año, en
+    # el orden de aparicion del CSV; el sprint va antes de la carrera del
+    # mismo fin de semana. Devuelve filas (Year, Grand Prix, Kind, Driver, PosNum).
+    parts = [("race", race_details)]
+    if sprint_results is not None:
+        parts.append(("sprint", sprint_results))
+    frames = []
+    for kind, df in parts:
+        df = own(df)[["Year", "Grand Prix", "Driver", "Pos"]]
+        df["Year"] = to_numeric(df["Year"])
+        df = df.dropna(subset=["Year", "Grand Prix", "Driver"])
+        df["Year"] = df["Year"].astype(int)
+        df["Kind"] = kind
+        df["PosNum"] = to_numeric(df["Pos"])
+        frames.append(df.drop(columns="Pos"))
+    events = pd.concat(frames, ignore_index=True)
+
+    race_order = (
+        events.loc[events["Kind"] == "race", ["Year", "Grand Prix"]]
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+    race_order["Round"] = race_order.groupby("Year").cumcount()
+    events = events.merge(race_order, on=["Year", "Grand Prix"], how="left")
+    events["Round"] = events["Round"].fillna(np.inf)
+    events["KindOrder"] = (events["Kind"] == "race").astype(int)
+    return events.sort_values(
+        ["Year", "Round", "KindOrder"], kind="stable"
+    ).reset_index(drop=True)[EVENT_KEYS + ["Driver", "PosNum"]]
+
+
+class EloRatings:
+    # Elo multijugador: cada carrera es un todos contra todos entre los
+    # participantes. Los no clasificados empatan entre si detras de los
+    # clasificados. Las matrices de resultado y esperanza son (n x n).
+
+    def __init__(self, k=32.0, initial=1500.0, sprint_weight=0.5):
+        self.k = k
+        self.initial = initial
+        self.sprint_weight = sprint_weight
+        self.drivers = []
+        self._position = {}
+        self.ratings = np.empty(0)
+        self.events = []
+        self._seen = set()
+        self._history = []
+        self._rows_hash = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def _indices(self, drivers):
+        for name in drivers:
+            if name not in self._position:
+                self._position[name] = len(self.drivers)
+                self.drivers.append(name)
+        missing = len(self.drivers) - len(self.ratings)
+        if missing:
+            self.ratings = np.r_[self.ratings, np.full(missing, self.initial)]
+        return np.array([self._position[name] for name in drivers], dtype=np.int64)
+
+    def update(self, drivers, positions, weight=1.0):
+        idx = self._indices(drivers)
+        n = len(idx)
+        if n < 2:
+            return np.zeros(n)
+        positions = np.asarray(positions, dtype=float)
+        positions = np.where(np.isnan(positions), np.inf, positions)
+
+        rating = self.ratings[idx]
+        expected = 1.0 / (1.0 + 10.0 ** ((rating[None, :] - rating[:, None]) / 400.0))
+        score = (positions[:, None] < positions[None, :]) + 0.5 * (
+            positions[:, None] == positions[None, :]
+        )
+        np.fill_diagonal(expected, 0.0)
+        np.fill_diagonal(score, 0.0)
+        delta = self.k * weight / (n - 1) * (score - expected).sum(axis=1)
+        self.ratings[idx] = rating + delta
+        return delta
+
+    def add_event(self, year, grand_prix, kind, drivers, positions):
+        key = (int(year), grand_prix, kind)
+        if key in self._seen:
+            return False
+        drivers = list(drivers)
+        positions = np.asarray(positions, dtype=float)
+        if len(set(drivers)) < len(drivers):
+            # Coche compartido: el piloto cuenta una vez con su mejor posicion.
+            entry = pd.Series(positions, index=drivers).groupby(level=0, sort=False).min()
+            drivers, positions = entry.index.tolist(), entry.to_numpy()
+        weight = self.sprint_weight if kind == "sprint" else 1.0
+        self.update(drivers, positions, weight)
+
+        self._seen.add(key)
+        self.events.append(key)
+        idx = self._indices(drivers)
+        self._history.append(
+            (np.full(len(idx), len(self.events) - 1), idx, self.ratings[idx].copy())
+        )
+        return True
+
+    def extend(self, race_details, sprint_results=None):
+        # Procesa solo los eventos que aun no se habian visto: al anexar una
+        # carrera nueva al CSV basta con volver a llamar a extend.
+        events = race_events(race_details, sprint_results)
+        keys = pd.MultiIndex.from_frame(events[EVENT_KEYS])
+        events = events[~keys.isin(list(self._seen))]
+        if events.empty:
+            return 0
+        self._rows_hash = (self._rows_hash + _rows_hash(events)) % (1 << 64)
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(events[EVENT_KEYS]))
+        bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+        drivers = events["Driver"].tolist()
+        positions = events["PosNum"].to_numpy(dtype=float)
+        added = 0
+        for code, start, end in zip(codes[bounds[:-1]], bounds[:-1], bounds[1:]):
+            year, grand_prix, kind = uniques[code]
+            added += self.add_event(
+                year, grand_prix, kind, drivers[start:end], positions[start:end]
+            )
+        return added
+
+    @classmethod
+    def from_frames(cls, race_details, sprint_results=None, **params):
+        ratings = cls(**params)
+        ratings.extend(race_details, sprint_results)
+        return ratings
+
+    def table(self):
+        history = self.history()
+        summary = history.groupby("Driver").agg(
+            events=("Rating", "size"),
+            peak=("Rating", "max"),
+            first_year=("Year", "min"),
+            last_year=("Year", "max"),
+        )
+        summary["rating"] = pd.Series(self.ratings, index=self.drivers)
+        return summary.sort_values("peak", ascending=False).reset_index()
+
+    def history(self):
+        columns = ["Event", "Year", "Grand Prix", "Kind", "Season", "Driver", "Rating"]
+        if not self._history:
+            return pd.DataFrame(columns=columns)
+        numbers = np.concatenate([item[0] for item in self._history])
+        idx = np.concatenate([item[1] for item in self._history])
+        values = np.concatenate([item[2] for item in self._history])
+        events = pd.DataFrame(self.events, columns=EVENT_KEYS)
+        # Año fraccionario para dibujar la evolucion dentro de cada temporada.
+        by_year = events.groupby("Year")
+        events["Season"] = events["Year"] + by_year.cumcount() / by_year["Year"].transform("size")
+        history = events.iloc[numbers].reset_index(drop=True)
+        history.insert(0, "Event", numbers)
+        history["Driver"] = np.asarray(self.drivers, dtype=object)[idx]
+        history["Rating"] = values
+        return history[columns]
+
+    def matches_prefix(self, race_details, sprint_results=None):
+        # True si los eventos ya procesados son el inicio de los del CSV con
+        # las mismas filas, es decir, si solo se han anexado carreras y basta
+        # con extend; si se ha editado o insertado algo hay que recalcular.
+        events = race_events(race_details, sprint_results)
+        keys = list(events[EVENT_KEYS].drop_duplicates().itertuples(index=False, name=None))
+        if keys[: len(self.events)] != self.events:
+            return False
+        seen = pd.MultiIndex.from_frame(events[EVENT_KEYS]).isin(self.events)
+        return _rows_hash(events[seen]) == self._rows_hash
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle(self, path)
+
+    @staticmethod
+    def load(path):
+        return pd.read_pickle(path)
@@ -0,0 +1,130 @@
+﻿import numpy as np
+import pandas as pd
+
+from src.cleaning import own, to_numeric
+
+
+MODERN = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+SPRINT_2022 = [8, 7, 6, 5, 4, 3, 2, 1]
+
+# race/sprint: puntos por posicion (1.º, 2.º, ...); fastest_lap: punto extra
+# para la vuelta rapida si el piloto puntua en esa carrera (regla 2019+).
+POINTS_SCHEMES = {
+    "9-6-4-3-2-1": {"race": [9, 6, 4, 3, 2, 1], "sprint": [], "fastest_lap": 0},
+    "10-6-4-3-2-1": {"race": [10, 6, 4, 3, 2, 1], "sprint": [], "fastest_lap": 0},
+    "10-8-6-5-4-3-2-1": {"race": [10, 8, 6, 5, 4, 3, 2, 1], "sprint": [], "fastest_lap": 0},
+    "25-18-15 (2010)": {"race": MODERN, "sprint": [], "fastest_lap": 0},
+    "2010 + vuelta rápida": {"race": MODERN, "sprint": [], "fastest_lap": 1},
+    "2010 + sprint": {"race": MODERN, "sprint": SPRINT_2022, "fastest_lap": 0},
+    "2010 + sprint + vuelta rápida": {
+        "race": MODERN,
+        "sprint": SPRINT_2022,
+        "fastest_lap": 1,
+    },
+    "Solo victorias": {"race": [1], "sprint": [], "fastest_lap": 0},
+}
+
+
+def points_matrix(schemes, key, n_positions):
+    # Tabla (esquema x posicion) con la columna 0 para no clasificados.
+    matrix = np.zeros((len(schemes), n_positions + 1))
+    for i, scheme in enumerate(schemes.values()):
+        points = scheme[key][:n_positions]
+        matrix[i, 1:len(points) + 1] = points
+    return matrix
+
+
+def _results(df):
+    df = own(df)[["Year", "Grand Prix", "Driver", "Pos"]]
+    df["Year"] = to_numeric(df["Year"])
+    df["PosNum"] = to_numeric(df["Pos"])
+    df = df.dropna(subset=["Year", "Grand Prix", "Driver"])
+    df["Year"] = df["Year"].astype(int)
+    # Coches compartidos: una fila por piloto y carrera con su mejor posicion.
+    df = df.groupby(["Year", "Grand Prix", "Driver"], as_index=False, sort=False)[
+        "PosNum"
+    ].min()
+    return df
+
+
+def recompute_standings(race_details, sprint_results=None, fastest_laps=None, schemes=None):
+    schemes = POINTS_SCHEMES if schemes is None else schemes
+    race = _results(race_details)
+    race["Kind"] = "race"
+    parts = [race]
+    if sprint_results is not None:
+        sprint = _results(sprint_results)
+        sprint["Kind"] = "sprint"
+        parts.append(sprint)
+    results = pd.concat(parts, ignore_index=True)
+
+    pos = results["PosNum"].fillna(0).astype(int).to_numpy()
+    n_positions = int(pos.max(initial=0))
+    is_sprint = (results["Kind"] == "sprint").to_numpy()
+
+    # Una sola consulta por tabla: (esquema x fila) de puntos.
+    race_points = points_matrix(schemes, "race", n_positions)[:, pos]
+    sprint_points = points_matrix(schemes, "sprint", n_positions)[:, pos]
+    points = np.where(is_sprint[None, :], sprint_points, race_points)
+
+    if fastest_laps is not None:
+        fastest = own(fastest_laps)[["Year", "Grand Prix", "Driver"]]
+        fastest["Year"] = to_numeric(fastest["Year"])
+        fastest = pd.MultiIndex.from_frame(fastest.dropna())
+        keys = pd.MultiIndex.from_frame(results[["Year", "Grand Prix", "Driver"]])
+        has_lap = keys.isin(fastest) & ~is_sprint
+        bonus = np.array([scheme["fastest_lap"] for scheme in schemes.values()], dtype=float)
+        points = points + bonus[:, None] * (has_lap[None, :] & (race_points > 0))
+
+    codes, uniques = pd.factorize(pd.MultiIndex.from_frame(results[["Year", "Driver"]]))
+    n_groups = len(uniques)
+    n_schemes = len(schemes)
+    flat = (np.arange(n_schemes)[:, None] * n_groups + codes[None, :]).ravel()
+    totals = np.bincount(flat, weights=points.ravel(), minlength=n_schemes * n_groups)
+    totals = totals.reshape(n_schemes, n_groups)
+
+    # Recuento de posiciones en carrera para desempatar (victorias, segundos...).
+    race_rows = ~is_sprint
+    countback = np.zeros((n_groups, n_positions + 1))
+    np.add.at(countback, (codes[race_rows], pos[race_rows]), 1)
+
+    standings = pd.DataFrame(list(uniques), columns=["Year", "Driver"])
+    for i, name in enumerate(schemes):
+        standings[name] = totals[i]
+    return standings, countback[:, 1:]
+
+
+def champions(standings, countback, schemes=None):
+    # Campeon por temporada y esquema: mas puntos y, en caso de empate,
+    # mas victorias, luego mas segundos puestos, etc.
+    schemes = POINTS_SCHEMES if schemes is None else schemes
+    years = standings["Year"].to_numpy()
+    result = {}
+    for name in schemes:
+        keys = [-countback[:, j] for j in range(countback.shape[1] - 1, -1, -1)]
+        order = np.lexsort(keys + [-standings[name].to_numpy(), years])
+        first = order[np.r_[True, years[order][1:] != years[order][:-1]]]
+        result[name] = pd.Series(
+            standings["Driver"].to_numpy()[first], index=years[first], name=name
+        )
+    return pd.DataFrame(result).rename_axis("Year")
+
+
+def official_champions(driver_standings):
+    standings = own(driver_standings)
+    standings["Year"] = to_numeric(standings["Year"])
+    standings["Pos"] = to_numeric(standings["Pos"])
+    standings = standings[standings["Pos"] == 1].dropna(subset=["Year"])
+    return standings.groupby(standings["Year"].astype(int))["Driver"].first()
+
+
+def title_changes(race_details, driver_standings, sprint_results=None, fastest_laps=None, schemes=None):
+    schemes = POINTS_SCHEMES if schemes is None else schemes
+    standings, countback = recompute_standings(
+        race_details, sprint_results, fastest_laps, schemes
+    )
+    table = champions(standings, countback, schemes)
+    official = official_champions(driver_standings).rename("official")
+    table = table.join(official, how="inner")
+    changed = table[list(schemes)].ne(table["official"], axis=0)
+    return table, changed
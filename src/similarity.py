@@ -0,0 +1,142 @@
+﻿import numpy as np
+import pandas as pd
+
+from src.cleaning import add_driver_key, own, to_numeric
+
+
+FINISH_BINS = [
+    ("P1", 1, 1),
+    ("P2", 2, 2),
+    ("P3", 3, 3),
+    ("P4-6", 4, 6),
+    ("P7-10", 7, 10),
+    ("P11+", 11, np.inf),
+]
+DELTA_BINS = [
+    ("-5 o peor", -np.inf, -5),
+    ("-4..-1", -4, -1),
+    ("0", 0, 0),
+    ("+1..+4", 1, 4),
+    ("+5 o mejor", 5, np.inf),
+]
+SEARCH_BLOCK = 1024
+
+
+def driver_features(race_details, starting_grids, min_starts=10):
+    # Una fila por piloto (por nombre) con la distribucion de resultados,
+    # de posiciones ganadas, puntos por salida relativos al ganador y la
+    # duracion de la carrera deportiva; columnas estandarizadas (z-score).
+    race = add_driver_key(own(race_details))
+    race["Year"] = to_numeric(race["Year"])
+    race["FinishPos"] = to_numeric(race["Pos"])
+    race["PTS"] = to_numeric(race["PTS"]).fillna(0)
+    race = race.dropna(subset=["Year", "Grand Prix", "Driver"])
+    best = race.groupby(["Year", "Grand Prix"])["PTS"].transform("max")
+    race["PointsShare"] = (race["PTS"] / best.where(best > 0)).fillna(0)
+
+    grid = add_driver_key(own(starting_grids))
+    grid["Year"] = to_numeric(grid["Year"])
+    grid["GridPos"] = to_numeric(grid["Pos"])
+    grid = grid.dropna(subset=["Year", "Grand Prix", "DriverKey", "GridPos"])
+    grid = grid.drop_duplicates(["Year", "Grand Prix", "DriverKey"])
+    race = race.merge(
+        grid[["Year", "Grand Prix", "DriverKey", "GridPos"]],
+        on=["Year", "Grand Prix", "DriverKey"],
+        how="left",
+    )
+
+    columns = {}
+    finish = race["FinishPos"]
+    for label, low, high in FINISH_BINS:
+        columns[f"final {label}"] = finish.between(low, high)
+    columns["final DNF"] = finish.isna()
+    delta = race["GridPos"] - finish
+    for label, low, high in DELTA_BINS:
+        columns[f"ganadas {label}"] = delta.between(low, high)
+    indicators = pd.DataFrame(columns).astype(float)
+    indicators["Driver"] = race["Driver"].to_numpy()
+    by_driver = indicators.groupby("Driver")
+
+    features = by_driver.mean()
+    # Las posiciones ganadas solo cuentan salidas con grid y final conocidos.
+    delta_cols = [f"ganadas {label}" for label, _, _ in DELTA_BINS]
+    with_delta = delta.notna().groupby(race["Driver"]).sum()
+    features[delta_cols] = (
+        by_driver[delta_cols].sum().div(with_delta.where(with_delta > 0), axis=0).fillna(0)
+    )
+
+    starts = race.groupby("Driver").size()
+    years = race.groupby("Driver")["Year"]
+    features["puntos por salida"] = race.groupby("Driver")["PointsShare"].mean()
+    features["temporadas"] = years.max() - years.min() + 1
+    features["salidas (log)"] = np.log1p(starts)
+    features = features[starts >= min_starts]
+
+    std = features.std(ddof=0).replace(0, 1)
+    scaled = (features - features.mean()) / std
+    return features.index.tolist(), scaled.to_numpy(dtype=np.float32), features.columns.tolist()
+
+
+class SimilarityIndex:
+    # Busqueda exacta top-k sobre una matriz densa float32 (pilotos x
+    # caracteristicas); las consultas se resuelven por bloques de filas con
+    # un producto matricial por bloque.
+
+    def __init__(self, names, matrix, feature_names=None):
+        self.names = list(names)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.feature_names = list(feature_names or [])
+        self._position = {name: i for i, name in enumerate(self.names)}
+        self.norms = np.linalg.norm(self.matrix, axis=1)
+        safe = np.where(self.norms > 0, self.norms, 1).astype(np.float32)
+        self.unit = self.matrix / safe[:, None]
+        self.squared = (self.matrix.astype(np.float64) ** 2).sum(axis=1)
+
+    @classmethod
+    def from_frames(cls, race_details, starting_grids, min_starts=10):
+        names, matrix, feature_names = driver_features(race_details, starting_grids, min_starts)
+        return cls(names, matrix, feature_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _scores(self, rows, metric):
+        # Mayor = mas parecido en ambos casos (la euclidea se devuelve negada).
+        if metric == "cosine":
+            return self.unit[rows] @ self.unit.T
+        if metric == "euclidean":
+            cross = self.matrix[rows] @ self.matrix.T
+            squared = self.squared[rows][:, None] + self.squared[None, :] - 2 * cross
+            return -np.sqrt(np.maximum(squared, 0))
+        raise ValueError(f"Metrica desconocida: {metric} (disponibles: cosine, euclidean)")
+
+    def search(self, rows=None, k=5, metric="cosine", block=SEARCH_BLOCK):
+        rows = np.arange(len(self.names)) if rows is None else np.asarray(rows)
+        k = min(k, len(self.names) - 1)
+        indices = np.empty((len(rows), k), dtype=np.int64)
+        scores = np.empty((len(rows), k), dtype=np.float32)
+        if k <= 0:
+            return indices, scores
+        for start in range(0, len(rows), block):
+            part = rows[start:start + block]
+            values = self._scores(part, metric)
+            values[np.arange(len(part)), part] = -np.inf
+            top = np.argpartition(-values, k - 1, axis=1)[:, :k]
+            top_values = np.take_along_axis(values, top, axis=1)
+            order = np.argsort(-top_values, axis=1, kind="stable")
+            indices[start:start + len(part)] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + len(part)] = np.take_along_axis(top_values, order, axis=1)
+        if metric == "euclidean":
+            scores = -scores
+        return indices, scores
+
+    def most_similar(self, driver, k=5, metric="cosine"):
+        if driver not in self._position:
+            raise KeyError(f"Piloto sin suficientes salidas o desconocido: {driver}")
+        indices, scores = self.search([self._position[driver]], k, metric)
+        return pd.DataFrame(
+            {
+                "Driver": [self.names[i] for i in indices[0]],
+                "distance" if metric == "euclidean" else "similarity": scores[0],
+            }
+        )
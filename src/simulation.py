@@ -0,0 +1,186 @@
+﻿from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import own, to_numeric
+
+
+SIM_CHUNK = 5000
+DNF_POSITION = 99
+
+
+def _season_results(df, year):
+    df = own(df)[["Year", "Grand Prix", "Driver", "Pos", "PTS"]]
+    df["Year"] = to_numeric(df["Year"])
+    df = df[df["Year"] == year].dropna(subset=["Grand Prix", "Driver"])
+    df["PosNum"] = to_numeric(df["Pos"])
+    df["PTS"] = to_numeric(df["PTS"]).fillna(0)
+    return df
+
+
+def _points_table(results, size):
+    # Puntos por posicion deducidos de los propios resultados; la moda por
+    # posicion descarta la vuelta rapida y las carreras a mitad de puntos.
+    classified = results.dropna(subset=["PosNum"])
+    by_pos = classified.groupby(classified["PosNum"].astype(int))["PTS"].agg(
+        lambda points: points.mode().iloc[0]
+    )
+    table = np.zeros(size)
+    by_pos = by_pos[(by_pos.index >= 1) & (by_pos.index <= size)]
+    table[by_pos.index.to_numpy() - 1] = by_pos.to_numpy()
+    return table
+
+
+def _finishes(results):
+    finishes = results["PosNum"].fillna(DNF_POSITION)
+    return {driver: part.to_numpy() for driver, part in finishes.groupby(results["Driver"])}
+
+
+def _sample_matrix(rows):
+    # Matriz (pilotos x observaciones) rellena por la derecha; counts dice
+    # cuantas observaciones son validas en cada fila.
+    counts = np.array([len(row) for row in rows])
+    matrix = np.full((len(rows), max(counts.max(initial=0), 1)), float(DNF_POSITION))
+    for i, row in enumerate(rows):
+        matrix[i, : len(row)] = row
+    return matrix, counts
+
+
+def season_inputs(race_details, sprint_results, year, min_share=0.5):
+    race = _season_results(race_details, year)
+    sprint = _season_results(sprint_results, year)
+    n_races = race["Grand Prix"].nunique()
+    n_sprints = sprint["Grand Prix"].nunique()
+
+    # Solo pilotos titulares: los que corren al menos min_share de las carreras.
+    starts = race.groupby("Driver")["Grand Prix"].nunique()
+    drivers = sorted(starts[starts >= min_share * n_races].index)
+    race = race[race["Driver"].isin(drivers)]
+    sprint = sprint[sprint["Driver"].isin(drivers)]
+
+    race_finishes = _finishes(race)
+    sprint_finishes = _finishes(sprint)
+    none = np.array([float(DNF_POSITION)])
+    race_samples, race_counts = _sample_matrix(
+        [race_finishes.get(driver, none) for driver in drivers]
+    )
+    # Un titular sin sprints (sustituido ese fin de semana) usa su
+    # distribucion de carrera.
+    sprint_samples, sprint_counts = _sample_matrix(
+        [sprint_finishes.get(driver, race_finishes.get(driver, none)) for driver in drivers]
+    )
+
+    return {
+        "year": int(year),
+        "drivers": drivers,
+        "n_races": int(n_races),
+        "n_sprints": int(n_sprints),
+        "race_samples": race_samples,
+        "race_counts": race_counts,
+        "sprint_samples": sprint_samples,
+        "sprint_counts": sprint_counts,
+        "race_points": _points_table(race, len(drivers)),
+        "sprint_points": _points_table(sprint, len(drivers)),
+    }
+
+
+def _draw_points(rng, samples, counts, points, size, n_events):
+    # (size x eventos x pilotos): cada piloto saca una posicion de su
+    # distribucion empirica; el ruido uniforme deshace empates al ordenar.
+    n_drivers = len(counts)
+    picks = (rng.random((size, n_events, n_drivers)) * counts).astype(np.int64)
+    draws = samples[np.arange(n_drivers), picks] + rng.random((size, n_events, n_drivers))
+    order = np.argsort(draws, axis=-1)
+    awarded = np.empty_like(draws)
+    np.put_along_axis(awarded, order, np.broadcast_to(points, draws.shape), axis=-1)
+    return awarded.sum(axis=1)
+
+
+def _simulate_chunk(task):
+    inputs, size, seed = task
+    rng = np.random.default_rng(seed)
+    race_totals = _draw_points(
+        rng,
+        inputs["race_samples"],
+        inputs["race_counts"],
+        inputs["race_points"],
+        size,
+        inputs["n_races"],
+    )
+    sprint_totals = _draw_points(
+        rng,
+        inputs["sprint_samples"],
+        inputs["sprint_counts"],
+        inputs["sprint_points"],
+        size,
+        inputs["n_sprints"],
+    )
+    without = race_totals.argmax(axis=1)
+    with_sprint = (race_totals + sprint_totals).argmax(axis=1)
+    n_drivers = len(inputs["drivers"])
+    return (
+        np.bincount(with_sprint, minlength=n_drivers),
+        np.bincount(without, minlength=n_drivers),
+        int((with_sprint != without).sum()),
+    )
+
+
+def simulate_season(inputs, n_sims=100000, seed=0, workers=None, chunk=SIM_CHUNK):
+    # Cada bloque de `chunk` temporadas tiene su propia semilla derivada de
+    # `seed`, asi que el resultado no depende de `workers`.
+    sizes = [min(chunk, n_sims - start) for start in range(0, n_sims, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(inputs, size, child) for size, child in zip(sizes, seeds)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task) for task in tasks]
+
+    with_sprint = sum(result[0] for result in results)
+    without = sum(result[1] for result in results)
+    flips = sum(result[2] for result in results)
+    return with_sprint / n_sims, without / n_sims, flips / n_sims
+
+
+def sprint_title_simulation(race_details, sprint_results, n_sims=100000, seed=2024, workers=None):
+    # Repite cada temporada con sprint n_sims veces con y sin los puntos del
+    # sprint y mide con que frecuencia cambia el campeon.
+    years = sorted(to_numeric(sprint_results["Year"]).dropna().astype(int).unique())
+    summary = []
+    probabilities = []
+    for year in years:
+        inputs = season_inputs(race_details, sprint_results, year)
+        if len(inputs["drivers"]) < 2 or inputs["n_races"] == 0:
+            continue
+        p_with, p_without, flip_rate = simulate_season(
+            inputs, n_sims=n_sims, seed=[seed, year], workers=workers
+        )
+        summary.append(
+            (year, n_sims, inputs["n_races"], inputs["n_sprints"], flip_rate)
+        )
+        probabilities.append(
+            pd.DataFrame(
+                {
+                    "Year": year,
+                    "Driver": inputs["drivers"],
+                    "p_with_sprint": p_with,
+                    "p_without_sprint": p_without,
+                }
+            )
+        )
+    summary = pd.DataFrame(
+        summary, columns=["Year", "n_sims", "races", "sprints", "flip_rate"]
+    )
+    if probabilities:
+        probabilities = pd.concat(probabilities, ignore_index=True)
+    else:
+        probabilities = pd.DataFrame(
+            columns=["Year", "Driver", "p_with_sprint", "p_without_sprint"]
+        )
+    return summary, probabilities
@@ -0,0 +1,272 @@
+﻿from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import add_finish_pos, merge_race_grid, to_numeric
+
+
+BOOTSTRAP_BATCH = 500
+PERMUTATION_CHUNK = 2000
+
+
+def grouped_quantiles(values, codes, n_groups, qs, order=None):
+    # Cuantiles con interpolacion lineal (como pandas) para todos los grupos
+    # y todos los q a la vez. `order` es el argsort global de values: se
+    # reordena por grupo con un sort estable sobre los codigos, sin volver a
+    # ordenar los valores.
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    qs = np.atleast_1d(np.asarray(qs, dtype=float))
+    if order is None:
+        order = np.argsort(values, kind="stable")
+    by_group = order[np.argsort(codes[order], kind="stable")]
+    sorted_values = values[by_group]
+
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    result = np.full((n_groups, len(qs)), np.nan)
+    present = counts > 0
+    if not present.any():
+        return result
+
+    pos = starts[present, None] + (counts[present, None] - 1) * qs[None, :]
+    low = np.floor(pos).astype(np.int64)
+    high = np.ceil(pos).astype(np.int64)
+    frac = pos - low
+    result[present] = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * frac
+    return result
+
+
+def quantile_label(q):
+    return f"p{q * 100:g}"
+
+
+def grouped_quantile_flags(df, value_col, groupings, qs):
+    # groupings: {"season": ["Year"], "team": ["Car"], ...}. Devuelve los
+    # umbrales por grupo y un flag por fila (valor > umbral) sin merges.
+    qs = list(qs)
+    df = df.dropna(subset=[value_col])
+    values = df[value_col].to_numpy(dtype=float)
+    order = np.argsort(values, kind="stable")
+
+    flags = pd.DataFrame(index=df.index)
+    thresholds = {}
+    for name, cols in groupings.items():
+        keys = df[cols]
+        valid = keys.notna().all(axis=1).to_numpy()
+        valid_keys = keys[valid]
+        valid_codes, uniques = pd.factorize(
+            pd.MultiIndex.from_frame(valid_keys) if len(cols) > 1 else valid_keys[cols[0]]
+        )
+        codes = np.full(len(keys), len(uniques))
+        codes[valid] = valid_codes
+        table = grouped_quantiles(values, codes, len(uniques) + 1, qs, order=order)
+        table[-1] = np.nan
+
+        labels = [quantile_label(q) for q in qs]
+        index = (
+            pd.MultiIndex.from_tuples(list(uniques), names=cols)
+            if len(cols) > 1
+            else pd.Index(uniques, name=cols[0])
+        )
+        thresholds[name] = pd.DataFrame(table[:-1], index=index, columns=labels)
+        row_thresholds = table[codes]
+        for i, label in enumerate(labels):
+            flags[f"{name}_{label}"] = values > row_thresholds[:, i]
+    return flags, thresholds
+
+
+def _weighted_ranks(values, weights):
+    # Rangos medios (ties = media) de una muestra en la que cada fila aparece
+    # weights[b, i] veces; values ya viene ordenado de forma ascendente.
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    tied = np.add.reduceat(weights, starts, axis=1)
+    below = np.cumsum(tied, axis=1) - tied
+    rank = below + (tied + 1) / 2
+    group = np.cumsum(np.r_[True, values[1:] != values[:-1]]) - 1
+    return rank[:, group]
+
+
+def _weighted_pearson(x, y, weights):
+    total = weights.sum(axis=1, keepdims=True)
+    mean_x = (weights * x).sum(axis=1, keepdims=True) / total
+    mean_y = (weights * y).sum(axis=1, keepdims=True) / total
+    dx = x - mean_x
+    dy = y - mean_y
+    cov = (weights * dx * dy).sum(axis=1)
+    var_x = (weights * dx * dx).sum(axis=1)
+    var_y = (weights * dy * dy).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / np.sqrt(var_x * var_y)
+
+
+def _bootstrap_spearman_batch(task):
+    x, y, clusters, n_boot, seed = task
+    rng = np.random.default_rng(seed)
+    n_clusters = clusters.max() + 1
+    counts = rng.multinomial(
+        n_clusters, np.full(n_clusters, 1 / n_clusters), size=n_boot
+    )
+    weights = counts[:, clusters].astype(float)
+
+    order_x = np.argsort(x, kind="stable")
+    rank_x = np.empty_like(weights)
+    rank_x[:, order_x] = _weighted_ranks(x[order_x], weights[:, order_x])
+    order_y = np.argsort(y, kind="stable")
+    rank_y = np.empty_like(weights)
+    rank_y[:, order_y] = _weighted_ranks(y[order_y], weights[:, order_y])
+    return _weighted_pearson(rank_x, rank_y, weights)
+
+
+def bootstrap_spearman(
+    df,
+    group_col,
+    cluster_col,
+    x_col,
+    y_col,
+    n_boot=2000,
+    seed=0,
+    alpha=0.05,
+    workers=None,
+):
+    # IC bootstrap del Spearman por grupo remuestreando clusters (p. ej.
+    # carreras dentro de cada temporada). Cada grupo (entero, p. ej. el año)
+    # se siembra con (seed, grupo) y cada lote con una semilla derivada, asi
+    # que el resultado de un grupo no depende de `workers` ni de los demas
+    # grupos: se puede recalcular solo una temporada.
+    df = df.dropna(subset=[group_col, cluster_col, x_col, y_col])
+    groups = []
+    tasks = []
+    for group, part in df.groupby(group_col, sort=True):
+        clusters, _ = pd.factorize(part[cluster_col])
+        if clusters.max(initial=-1) < 1:
+            continue
+        x = part[x_col].to_numpy(dtype=float)
+        y = part[y_col].to_numpy(dtype=float)
+        group_seeds = np.random.SeedSequence([seed, int(group)])
+        batches = range(0, n_boot, BOOTSTRAP_BATCH)
+        for batch_seed, start in zip(group_seeds.spawn(len(batches)), batches):
+            size = min(BOOTSTRAP_BATCH, n_boot - start)
+            tasks.append((x, y, clusters, size, batch_seed))
+            groups.append(group)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_bootstrap_spearman_batch, tasks, chunksize=4))
+    else:
+        results = [_bootstrap_spearman_batch(task) for task in tasks]
+
+    samples = {}
+    for group, values in zip(groups, results):
+        samples.setdefault(group, []).append(values)
+    rows = []
+    for group, parts in samples.items():
+        values = np.concatenate(parts)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            continue
+        low, high = np.quantile(values, [alpha / 2, 1 - alpha / 2])
+        rows.append((group, float(low), float(high)))
+    return pd.DataFrame(rows, columns=[group_col, "ci_low", "ci_high"])
+
+
+def season_spearman_bands(
+    race_details, starting_grids, n_boot=2000, seed=2024, workers=None
+):
+    merged = merge_race_grid(race_details, starting_grids)
+    merged = merged.dropna(subset=["FinishPos", "GridPos"])
+    bands = bootstrap_spearman(
+        merged,
+        "Year",
+        "Grand Prix",
+        "GridPos",
+        "FinishPos",
+        n_boot=n_boot,
+        seed=seed,
+        workers=workers,
+    )
+    bands["Year"] = bands["Year"].astype(int)
+    return bands
+
+
+def permutation_test(values, labels, n_perm=20000, seed=0, chunk=PERMUTATION_CHUNK):
+    # Test de permutacion de la diferencia de medias (grupo True - grupo
+    # False). Cada bloque de permutaciones es una matriz (chunk x n) de
+    # etiquetas barajadas y la estadistica sale de un solo producto matricial.
+    values = np.asarray(values, dtype=float)
+    labels = np.asarray(labels, dtype=bool)
+    n = len(values)
+    n_a = int(labels.sum())
+    n_b = n - n_a
+    if n_a == 0 or n_b == 0:
+        return None
+
+    total = values.sum()
+    observed = values[labels].mean() - values[~labels].mean()
+    rng = np.random.default_rng(seed)
+    base = np.zeros(n)
+    base[:n_a] = 1
+    extreme = 0
+    done = 0
+    while done < n_perm:
+        size = min(chunk, n_perm - done)
+        masks = rng.permuted(np.tile(base, (size, 1)), axis=1)
+        sums_a = masks @ values
+        diffs = sums_a / n_a - (total - sums_a) / n_b
+        extreme += int((np.abs(diffs) >= abs(observed) - 1e-12).sum())
+        done += size
+
+    group_a = values[labels]
+    group_b = values[~labels]
+    # Sin dispersion (o con dos valores) la d de Cohen no existe: None, que
+    # en el JSON sale como null en lugar de un NaN invalido.
+    cohen_d = None
+    if n > 2:
+        pooled_var = (n_a - 1) * group_a.var(ddof=1) + (n_b - 1) * group_b.var(ddof=1)
+        pooled = np.sqrt(np.nan_to_num(pooled_var) / (n - 2))
+        if pooled > 0:
+            cohen_d = float(observed / pooled)
+    cliffs = np.sign(group_a[:, None] - group_b[None, :]).mean()
+    return {
+        "n_a": n_a,
+        "n_b": n_b,
+        "n_perm": int(n_perm),
+        "mean_diff": float(observed),
+        "p_value": (extreme + 1) / (n_perm + 1),
+        "cohen_d": cohen_d,
+        "cliffs_delta": float(cliffs),
+    }
+
+
+def race_top10_variance(race_details, sprint_results):
+    race = add_finish_pos(race_details, "Pos")
+    race["Year"] = to_numeric(race["Year"])
+    race = race.dropna(subset=["Year", "Grand Prix", "FinishPos"])
+    race = race[race["FinishPos"] <= 10]
+
+    variance = (
+        race.groupby(["Year", "Grand Prix"])["FinishPos"]
+        .var()
+        .reset_index()
+    )
+
+    sprint_keys = sprint_results[["Year", "Grand Prix"]].drop_duplicates()
+    sprint_keys["Year"] = to_numeric(sprint_keys["Year"])
+    sprint_keys = sprint_keys.dropna()
+
+    variance["Sprint"] = pd.MultiIndex.from_frame(
+        variance[["Year", "Grand Prix"]]
+    ).isin(pd.MultiIndex.from_frame(sprint_keys))
+    return variance
+
+
+def sprint_permutation_test(race_details, sprint_results, n_perm=20000, seed=2024):
+    variance = race_top10_variance(race_details, sprint_results)
+    variance = variance.dropna(subset=["FinishPos"])
+    return permutation_test(
+        variance["FinishPos"].values, variance["Sprint"].values, n_perm=n_perm, seed=seed
+    )
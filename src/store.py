@@ -0,0 +1,110 @@
+﻿import json
+import shutil
+
+import pandas as pd
+
+from src.data_loader import BASE_DIR, load_csv, validate_columns
+
+
+STORE_DIR = BASE_DIR / "outputs" / "store"
+SCHEMA_FILE = "_schema.json"
+
+
+def _fingerprint(path):
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _partition(dataset_dir, year):
+    return dataset_dir / f"Year={year}.csv"
+
+
+def build_partitions(name, store_dir=STORE_DIR):
+    # Parte <name>.csv en un CSV por temporada y guarda los dtypes de la
+    # lectura completa para que cualquier subconjunto se lea igual.
+    filename = f"{name}.csv"
+    df = load_csv(filename, ["Year"])
+    dataset_dir = store_dir / name
+    if dataset_dir.exists():
+        shutil.rmtree(dataset_dir)
+    dataset_dir.mkdir(parents=True)
+
+    years = []
+    for year, part in df.groupby("Year", sort=True):
+        part.to_csv(_partition(dataset_dir, int(year)), index=False)
+        years.append(int(year))
+    schema = {
+        "source": filename,
+        "fingerprint": _fingerprint(BASE_DIR / filename),
+        "rows": len(df),
+        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "years": years,
+    }
+    with open(dataset_dir / SCHEMA_FILE, "w", encoding="utf-8") as handle:
+        json.dump(schema, handle, ensure_ascii=True, indent=2)
+    return schema
+
+
+def dataset_schema(name, store_dir=STORE_DIR):
+    # Reconstruye las particiones si faltan o si el CSV ha cambiado.
+    source = BASE_DIR / f"{name}.csv"
+    if not source.exists():
+        raise FileNotFoundError(f"No se encuentra el archivo: {source}")
+    path = store_dir / name / SCHEMA_FILE
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as handle:
+            schema = json.load(handle)
+        if schema.get("fingerprint") == _fingerprint(source):
+            return schema
+    return build_partitions(name, store_dir)
+
+
+def build_store(names, store_dir=STORE_DIR):
+    return {name: dataset_schema(name, store_dir) for name in names}
+
+
+def select_years(available, years):
+    # years: None (todas), un año, una coleccion de años o un predicado
+    # (p. ej. lambda year: year >= 2021).
+    if years is None:
+        return available
+    if callable(years):
+        return [year for year in available if years(year)]
+    if isinstance(years, int):
+        years = [years]
+    wanted = {int(year) for year in years}
+    return [year for year in available if year in wanted]
+
+
+def load_dataset(name, years=None, columns=None, store_dir=STORE_DIR):
+    # Solo abre las particiones de los años pedidos y solo parsea las
+    # columnas pedidas; el resultado sale ordenado por Year (y dentro de
+    # cada año en el orden del CSV) con los mismos dtypes que load_csv.
+    schema = dataset_schema(name, store_dir)
+    dtypes = schema["dtypes"]
+    if columns is None:
+        columns = list(dtypes)
+    else:
+        columns = list(columns)
+        validate_columns(pd.DataFrame(columns=list(dtypes)), columns, schema["source"])
+    dtype = {col: dtypes[col] for col in columns}
+
+    selected = select_years(schema["years"], years)
+    if selected and len(selected) == len(schema["years"]):
+        # Todas las temporadas: un solo CSV se lee antes que decenas de
+        # particiones pequeñas.
+        usecols = list(dict.fromkeys(columns + ["Year"]))
+        df = pd.read_csv(
+            BASE_DIR / schema["source"],
+            usecols=usecols,
+            dtype={col: dtypes[col] for col in usecols},
+        )
+        return df.sort_values("Year", kind="stable").reset_index(drop=True)[columns]
+    dataset_dir = store_dir / name
+    parts = [
+        pd.read_csv(_partition(dataset_dir, year), usecols=columns, dtype=dtype)
+        for year in selected
+    ]
+    if not parts:
+        return pd.DataFrame({col: pd.Series(dtype=dtype[col]) for col in columns})
+    return pd.concat(parts, ignore_index=True)[columns]
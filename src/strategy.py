@@ -0,0 +1,220 @@
+﻿import numpy as np
+import pandas as pd
+
+from src.cleaning import own, to_numeric
+
+
+RACE_KEYS = ["Year", "Grand Prix"]
+ENTRY_KEYS = RACE_KEYS + ["Driver"]
+STRATEGIES = ["0 paradas", "1 parada", "2 paradas", "3 paradas", "4+ paradas"]
+UNDERCUT_WINDOW = 5
+RIVAL_GRID_GAP = 3
+# Prohibicion del repostaje: separa las dos epocas de estrategia.
+REFUEL_BAN = 2010
+
+
+def strategy_label(n_stops):
+    return STRATEGIES[min(int(n_stops), len(STRATEGIES) - 1)]
+
+
+def _group_starts(df, keys):
+    # df ya ordenado por keys: True en la primera fila de cada grupo.
+    codes, _ = pd.factorize(pd.MultiIndex.from_frame(df[keys]))
+    return np.r_[True, codes[1:] != codes[:-1]] if len(codes) else np.zeros(0, dtype=bool)
+
+
+def pit_stops(pitstops):
+    # Una fila por parada, ordenada por (carrera, piloto, vuelta), con el
+    # numero de parada y la vuelta de la parada anterior (0 en la primera).
+    # Se ignoran las filas repetidas (mismo piloto y vuelta en la carrera).
+    # El numero de parada es el de la columna Stops cuando es coherente en
+    # todo el piloto y carrera (>= 1 y creciente con la vuelta), de modo que
+    # una parada que falte no desplaza a las siguientes; si no, se cuentan
+    # las filas.
+    columns = ENTRY_KEYS + ["Car", "Lap"] + (["Stops"] if "Stops" in pitstops.columns else [])
+    stops = own(pitstops)[columns]
+    stops["Year"] = to_numeric(stops["Year"])
+    stops["Lap"] = to_numeric(stops["Lap"])
+    stops = stops.dropna(subset=ENTRY_KEYS + ["Lap"])
+    stops["Year"] = stops["Year"].astype(int)
+    stops["Lap"] = stops["Lap"].astype(int)
+    stops = stops.drop_duplicates(ENTRY_KEYS + ["Lap"])
+    stops = stops.sort_values(ENTRY_KEYS + ["Lap"], kind="stable").reset_index(drop=True)
+
+    start = _group_starts(stops, ENTRY_KEYS)
+    laps = stops["Lap"].to_numpy()
+    rows = np.arange(len(stops))
+    first = np.maximum.accumulate(np.where(start, rows, 0))
+    counted = rows - first + 1
+    listed = (
+        to_numeric(stops.pop("Stops")).to_numpy(dtype=float)
+        if "Stops" in stops.columns
+        else np.full(len(stops), np.nan)
+    )
+    ok = (listed >= 1) & (listed == np.floor(listed))
+    ok[1:] &= start[1:] | (listed[1:] > listed[:-1])
+    entry = np.cumsum(start) - 1
+    entry_ok = np.ones(entry.max(initial=-1) + 1, dtype=bool)
+    np.logical_and.at(entry_ok, entry, ok)
+    previous = np.r_[0, laps[:-1]]
+    previous[start] = 0
+    stops["Stop"] = np.where(entry_ok[entry], listed, counted).astype(int)
+    stops["PrevLap"] = previous
+    stops["Last"] = np.r_[start[1:], True]
+    return stops
+
+
+def _entries(race_details):
+    race = own(race_details)[ENTRY_KEYS + ["Car", "Pos", "Laps"]]
+    race["Year"] = to_numeric(race["Year"])
+    race = race.dropna(subset=ENTRY_KEYS)
+    race["Year"] = race["Year"].astype(int)
+    race["FinishPos"] = to_numeric(race["Pos"])
+    race["Laps"] = to_numeric(race["Laps"])
+    return race.drop_duplicates(ENTRY_KEYS)[ENTRY_KEYS + ["Car", "FinishPos", "Laps"]]
+
+
+def reconstruct_stints(pitstops, race_details):
+    # Stints de cada piloto en las carreras con datos de paradas: entre dos
+    # paradas consecutivas y, el ultimo, desde la ultima parada hasta las
+    # vueltas completadas. Devuelve (stints, strategies) con una fila por
+    # stint de al menos una vuelta y otra por piloto y carrera.
+    stops = pit_stops(pitstops)
+    races = stops[RACE_KEYS].drop_duplicates()
+    entries = _entries(race_details).merge(races, on=RACE_KEYS, how="inner")
+    stops = stops.merge(entries[ENTRY_KEYS], on=ENTRY_KEYS, how="inner")
+
+    last = stops.loc[stops["Last"], ENTRY_KEYS + ["Stop", "Lap"]].rename(
+        columns={"Stop": "n_stops", "Lap": "last_stop_lap"}
+    )
+    first = stops.loc[stops["Stop"] == 1, ENTRY_KEYS + ["Lap"]].rename(
+        columns={"Lap": "first_stop_lap"}
+    )
+    strategies = entries.merge(last, on=ENTRY_KEYS, how="left").merge(
+        first, on=ENTRY_KEYS, how="left"
+    )
+    strategies["n_stops"] = strategies["n_stops"].fillna(0).astype(int)
+    strategies["Strategy"] = [strategy_label(n) for n in strategies["n_stops"]]
+
+    pit_stints = pd.DataFrame(
+        {
+            **{key: stops[key] for key in ENTRY_KEYS},
+            "Stint": stops["Stop"],
+            "StartLap": stops["PrevLap"],
+            "EndLap": stops["Lap"],
+        }
+    )
+    final_start = strategies["last_stop_lap"].fillna(0)
+    final = strategies["Laps"].where(strategies["Laps"] >= final_start)
+    last_stints = pd.DataFrame(
+        {
+            **{key: strategies[key] for key in ENTRY_KEYS},
+            "Stint": strategies["n_stops"] + 1,
+            "StartLap": final_start,
+            "EndLap": final,
+        }
+    ).dropna(subset=["EndLap"])
+    stints = pd.concat([pit_stints, last_stints], ignore_index=True)
+    stints = stints.sort_values(ENTRY_KEYS + ["Stint"], kind="stable").reset_index(drop=True)
+    stints["StintLaps"] = stints["EndLap"] - stints["StartLap"]
+    # Stints de 0 vueltas (parada en la vuelta 0, o abandono en la vuelta de
+    # la ultima parada) no son stints reales y bajarian las medias.
+    stints = stints[stints["StintLaps"] > 0].reset_index(drop=True)
+
+    by_entry = stints.groupby(ENTRY_KEYS, sort=False)["StintLaps"]
+    lengths = by_entry.agg(mean_stint="mean", longest_stint="max").reset_index()
+    strategies = strategies.merge(lengths, on=ENTRY_KEYS, how="left")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        strategies["longest_share"] = strategies["longest_stint"] / strategies["Laps"]
+    return stints, strategies
+
+
+def undercut_pairs(pitstops, race_details, starting_grids, strategy=None, window=UNDERCUT_WINDOW):
+    # Pares de pilotos clasificados que hacen la misma parada (1.a, 2.a...)
+    # con 1..window vueltas de diferencia. Ahead: el que para antes termina
+    # delante. Sin posiciones vuelta a vuelta, el orden previo es la
+    # parrilla: hay undercut con exito (Success) si el que para antes salio
+    # detras (Behind) y termina delante. Companeros = mismo Car; rivales =
+    # otro coche que salio a <= RIVAL_GRID_GAP posiciones en parrilla.
+    if strategy is None:
+        strategy = reconstruct_stints(pitstops, race_details)
+    _, strategies = strategy
+    grid = own(starting_grids)[ENTRY_KEYS + ["Pos"]]
+    grid["Year"] = to_numeric(grid["Year"])
+    grid["GridPos"] = to_numeric(grid["Pos"])
+    grid = grid.dropna(subset=ENTRY_KEYS + ["GridPos"]).drop_duplicates(ENTRY_KEYS)
+    grid["Year"] = grid["Year"].astype(int)
+
+    stops = pit_stops(pitstops)[ENTRY_KEYS + ["Car", "Lap", "Stop"]]
+    finishers = strategies.dropna(subset=["FinishPos"])[ENTRY_KEYS + ["FinishPos"]]
+    stops = stops.merge(finishers, on=ENTRY_KEYS, how="inner").merge(
+        grid[ENTRY_KEYS + ["GridPos"]], on=ENTRY_KEYS, how="left"
+    )
+
+    # Pares por vecindad: ordenadas las paradas por (carrera, parada, vuelta),
+    # cada fila solo se compara con las k siguientes mientras sigan en el
+    # mismo grupo y a <= window vueltas; k crece hasta que no queda ninguna.
+    stops = stops.sort_values(RACE_KEYS + ["Stop", "Lap"], kind="stable").reset_index(drop=True)
+    group = np.cumsum(_group_starts(stops, RACE_KEYS + ["Stop"]))
+    laps = stops["Lap"].to_numpy()
+    early = []
+    late = []
+    k = 1
+    while k < len(stops):
+        same = group[k:] == group[:-k]
+        offset = laps[k:] - laps[:-k]
+        near = same & (offset <= window)
+        if not near.any():
+            break
+        hit = np.flatnonzero(near & (offset >= 1))
+        early.append(hit)
+        late.append(hit + k)
+        k += 1
+    early = np.concatenate(early) if early else np.zeros(0, dtype=int)
+    late = np.concatenate(late) if late else np.zeros(0, dtype=int)
+    first = stops.iloc[early].reset_index(drop=True)
+    second = stops.iloc[late].reset_index(drop=True)
+
+    teammate = (first["Car"] == second["Car"]).to_numpy()
+    rival = ~teammate & (
+        (first["GridPos"] - second["GridPos"]).abs() <= RIVAL_GRID_GAP
+    ).to_numpy()
+    keep = teammate | rival
+    first = first[keep]
+    second = second[keep]
+    pairs = pd.DataFrame(
+        {
+            "Year": first["Year"],
+            "Grand Prix": first["Grand Prix"],
+            "Stop": first["Stop"],
+            "Early": first["Driver"],
+            "Late": second["Driver"],
+            "Offset": second["Lap"] - first["Lap"],
+            "Relation": np.where(teammate[keep], "companero", "rival"),
+            "Behind": first["GridPos"] > second["GridPos"],
+            "Ahead": first["FinishPos"] < second["FinishPos"],
+        }
+    )
+    pairs["Success"] = pairs["Behind"] & pairs["Ahead"]
+    return pairs.sort_values(RACE_KEYS + ["Stop"], kind="stable").reset_index(drop=True)
+
+
+def undercut_summary(pairs):
+    # pairs/ahead_rate: todos los pares y cuantos termina delante el que para
+    # antes; behind/rate: solo los pares en que salio detras y cuantos de
+    # ellos le adelanta (undercut con exito).
+    grouped = pairs.groupby(["Relation", "Offset"])
+    summary = grouped["Ahead"].agg(pairs="size", ahead_rate="mean")
+    summary["behind"] = grouped["Behind"].sum()
+    summary["rate"] = grouped["Success"].sum() / summary["behind"].where(summary["behind"] > 0)
+    return summary.reset_index()
+
+
+def strategy_shares(strategies):
+    # Reparto de estrategias por temporada entre los pilotos clasificados y
+    # mediana de vueltas por stint.
+    classified = strategies.dropna(subset=["FinishPos"])
+    shares = pd.crosstab(classified["Year"], classified["Strategy"], normalize="index")
+    shares = shares.reindex(columns=STRATEGIES, fill_value=0.0)
+    shares["median_stint"] = classified.groupby("Year")["mean_stint"].median()
+    return shares
@@ -0,0 +1,63 @@
+﻿import hashlib
+import os
+import shutil
+from pathlib import Path
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _same_content(src, dst):
+    if not dst.exists():
+        return False
+    src_stat = src.stat()
+    dst_stat = dst.stat()
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        # Hardlink de una version anterior: hay que romperlo con una copia.
+        return False
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    return file_digest(src) == file_digest(dst)
+
+
+def _publish(src, dst):
+    # Se copia a un temporal junto al destino y se renombra de forma atomica.
+    # Nunca se enlaza: el pipeline reescribe los originales en outputs/.
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def sync_directory(src_dir, dst_dir, patterns, prune=True):
+    src_dir = Path(src_dir)
+    dst_dir = Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = {"copied": 0, "unchanged": 0, "removed": 0}
+    published = set()
+    for pattern in patterns:
+        for src in sorted(src_dir.glob(pattern)):
+            if not src.is_file():
+                continue
+            published.add(src.name)
+            dst = dst_dir / src.name
+            if _same_content(src, dst):
+                stats["unchanged"] += 1
+            else:
+                _publish(src, dst)
+                stats["copied"] += 1
+
+    if prune:
+        for pattern in patterns:
+            for dst in dst_dir.glob(pattern):
+                if dst.is_file() and dst.name not in published:
+                    dst.unlink()
+                    stats["removed"] += 1
+    return stats
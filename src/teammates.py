@@ -0,0 +1,130 @@
+﻿import numpy as np
+import pandas as pd
+
+from src.cleaning import own, to_numeric
+
+
+TEAM_KEYS = ["Year", "Grand Prix", "Car"]
+SESSIONS = ["race", "qualifying"]
+MIN_DUELS = 50
+
+
+def _entries(df):
+    # Una fila por piloto, carrera y coche con su posicion numerica; los
+    # duplicados (coches compartidos, filas repetidas) se quedan con la mejor.
+    # Se usa el nombre y no DriverCode: los codigos se repiten entre epocas
+    # (ROS, VER, HIL...) y mezclarian carreras distintas.
+    df = own(df)
+    df["Year"] = to_numeric(df["Year"])
+    df["PosNum"] = to_numeric(df["Pos"])
+    df = df.dropna(subset=TEAM_KEYS + ["Driver", "PosNum"])
+    df = df.groupby(TEAM_KEYS + ["Driver"], as_index=False)["PosNum"].min()
+    df["Year"] = df["Year"].astype(int)
+    return df
+
+
+def teammate_pairs(df):
+    # Self-join agrupado por ordenacion: tras ordenar por (Year, Grand Prix,
+    # Car) cada fila se empareja solo con las siguientes de su grupo, asi que
+    # se generan k*(k-1)/2 parejas por grupo sin producto cartesiano global.
+    entries = _entries(df).sort_values(TEAM_KEYS + ["Driver"], kind="stable")
+    entries = entries.reset_index(drop=True)
+    codes = entries.groupby(TEAM_KEYS, sort=False).ngroup().to_numpy()
+    n = len(codes)
+    if n == 0:
+        return pd.DataFrame(
+            columns=TEAM_KEYS + ["Driver", "Teammate", "PosNum", "TeammatePos"]
+        )
+
+    group_start = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[group_start, n])
+    starts = np.repeat(group_start, sizes)
+    ends = starts + np.repeat(sizes, sizes)
+    rows = np.arange(n)
+    partners = ends - rows - 1
+
+    left = np.repeat(rows, partners)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = left + offsets + 1
+
+    keys = entries.loc[left, TEAM_KEYS].reset_index(drop=True)
+    driver = entries["Driver"].to_numpy()
+    pos = entries["PosNum"].to_numpy(dtype=float)
+    return keys.assign(
+        Driver=driver[left],
+        Teammate=driver[right],
+        PosNum=pos[left],
+        TeammatePos=pos[right],
+    )
+
+
+def _directed(pairs, session):
+    # Cada pareja aparece dos veces (una por piloto) con victoria/derrota.
+    forward = pairs[["Year", "Driver", "Teammate", "PosNum", "TeammatePos"]]
+    backward = forward.rename(
+        columns={
+            "Driver": "Teammate",
+            "Teammate": "Driver",
+            "PosNum": "TeammatePos",
+            "TeammatePos": "PosNum",
+        }
+    )
+    duels = pd.concat([forward, backward], ignore_index=True)
+    duels["Session"] = session
+    duels["Won"] = (duels["PosNum"] < duels["TeammatePos"]).astype(int)
+    return duels[["Session", "Year", "Driver", "Teammate", "Won"]]
+
+
+def head_to_head(race_details, qualifyings):
+    duels = pd.concat(
+        [
+            _directed(teammate_pairs(race_details), "race"),
+            _directed(teammate_pairs(qualifyings), "qualifying"),
+        ],
+        ignore_index=True,
+    )
+    duels["Duels"] = 1
+    return duels
+
+
+def season_tallies(duels):
+    tallies = (
+        duels.groupby(["Year", "Driver", "Teammate", "Session"])[["Won", "Duels"]]
+        .sum()
+        .unstack("Session", fill_value=0)
+    )
+    tallies.columns = [f"{session}_{col.lower()}" for col, session in tallies.columns]
+    for session in SESSIONS:
+        for col in ("won", "duels"):
+            if f"{session}_{col}" not in tallies.columns:
+                tallies[f"{session}_{col}"] = 0
+    columns = [f"{session}_{col}" for session in SESSIONS for col in ("won", "duels")]
+    return tallies[columns].sort_index().reset_index()
+
+
+def career_tallies(duels):
+    seasons = season_tallies(duels)
+    career = seasons.groupby("Driver").agg(
+        seasons=("Year", "nunique"),
+        teammates=("Teammate", "nunique"),
+        race_won=("race_won", "sum"),
+        race_duels=("race_duels", "sum"),
+        qualifying_won=("qualifying_won", "sum"),
+        qualifying_duels=("qualifying_duels", "sum"),
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        career["race_pct"] = career["race_won"] / career["race_duels"] * 100
+        career["qualifying_pct"] = (
+            career["qualifying_won"] / career["qualifying_duels"] * 100
+        )
+    return career.reset_index()
+
+
+def ranked_careers(career, top=20, min_duels=MIN_DUELS):
+    # Pilotos con suficientes duelos en carrera y clasificacion (deja fuera
+    # las inscripciones multiples de Indianapolis), ordenados por % en carrera.
+    eligible = career[
+        (career["race_duels"] >= min_duels) & (career["qualifying_duels"] >= min_duels)
+    ]
+    eligible = eligible.nlargest(top, "race_duels")
+    return eligible.sort_values("race_pct", ascending=False).reset_index(drop=True)
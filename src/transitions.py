@@ -0,0 +1,73 @@
+﻿import numpy as np
+
+from src.cleaning import add_decade, merge_race_grid
+
+
+class TransitionTensor:
+    # Conteos (decada x grid x final) de la tabla carrera+parrilla. El indice
+    # de grid es la posicion de salida (0 sin usar) y el de final la posicion
+    # de llegada, con 0 = no clasificado (DNF, NC, DQ...). `decades` guarda
+    # las etiquetas del primer eje aunque se agrupe por otra columna.
+
+    def __init__(self, decades, counts):
+        self.decades = np.asarray(decades)
+        self.counts = np.asarray(counts)
+
+    @classmethod
+    def from_merged(cls, merged, period="Decade"):
+        # period: "Decade" o cualquier columna de la tabla (p. ej. "Year").
+        merged = merged.dropna(subset=["GridPos"])
+        if period == "Decade":
+            merged = add_decade(merged, "Year")
+        else:
+            merged = merged.dropna(subset=[period])
+        grid = merged["GridPos"].to_numpy(dtype=float)
+        finish = merged["FinishPos"].to_numpy(dtype=float)
+        valid = (grid >= 1) & (grid % 1 == 0)
+        grid = grid[valid].astype(np.int64)
+        finish = np.nan_to_num(finish[valid], nan=0.0)
+        finish = np.where((finish >= 1) & (finish % 1 == 0), finish, 0).astype(np.int64)
+
+        decade_codes, decades = _codes(merged[period].to_numpy()[valid])
+        n_grid = int(grid.max(initial=0)) + 1
+        n_finish = int(finish.max(initial=0)) + 1
+        # Un solo bincount sobre el indice plano (decada, grid, final).
+        flat = (decade_codes * n_grid + grid) * n_finish + finish
+        counts = np.bincount(flat, minlength=len(decades) * n_grid * n_finish)
+        return cls(decades, counts.reshape(len(decades), n_grid, n_finish))
+
+    def finishers(self):
+        return self.counts[:, :, 1:].sum(axis=2)
+
+    def starters(self):
+        return self.counts.sum(axis=2)
+
+    def top_k(self, k):
+        # P(final <= k | grid) entre los clasificados; NaN si no hay ninguno.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.counts[:, :, 1:k + 1].sum(axis=2) / self.finishers()
+
+    def dnf_rate(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.counts[:, :, 0] / self.starters()
+
+    def expected_gain(self):
+        # Posiciones ganadas de media (grid - final) entre los clasificados.
+        grid = np.arange(self.counts.shape[1])[:, None]
+        finish = np.arange(1, self.counts.shape[2])[None, :]
+        gained = (self.counts[:, :, 1:] * (grid - finish)).sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return gained / self.finishers()
+
+    def grid_slots(self, decade_index):
+        # Posiciones de salida con al menos un clasificado en la decada.
+        return np.flatnonzero(self.finishers()[decade_index] > 0)
+
+
+def grid_transition_tensor(race_details, starting_grids):
+    return TransitionTensor.from_merged(merge_race_grid(race_details, starting_grids))
+
+
+def _codes(values):
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes.astype(np.int64), uniques
@@ -0,0 +1,165 @@
+﻿from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+
+import pandas as pd
+
+from src.cleaning import add_driver_key, parse_time, to_numeric
+from src.data_loader import BASE_DIR
+
+
+NUMERIC_COLUMNS = {
+    "race_details": ["Pos", "Laps", "PTS", "Year"],
+    "driver_standings": ["Pos", "PTS", "Year"],
+    "constructor_standings": ["Pos", "PTS", "Year"],
+    "starting_grids": ["Pos", "Year"],
+    "pitstops": ["Stops", "Lap", "Time", "Total", "Year"],
+    "sprint_results": ["Pos", "Laps", "PTS", "Year"],
+    "sprint_grid": ["Pos", "Year"],
+    "qualifyings": ["Pos", "Year"],
+    "practices": ["Pos", "Year"],
+    "fastestlaps_detailed": ["Pos", "Lap", "Year"],
+}
+
+TIME_COLUMNS = {
+    "qualifyings": ["Q1", "Q2", "Q3", "Time"],
+    "practices": ["Time", "Gap"],
+    "fastestlaps_detailed": ["Time"],
+    "starting_grids": ["Time"],
+    "sprint_grid": ["Time"],
+}
+
+# Claves que deberian ser unicas por fila; Year/Grand Prix/DriverKey salvo
+# donde el dataset tiene varias filas legitimas por piloto y carrera.
+RACE_KEY = ["Year", "Grand Prix", "DriverKey"]
+UNIQUE_KEYS = {
+    "race_details": RACE_KEY,
+    "starting_grids": RACE_KEY,
+    "sprint_results": RACE_KEY,
+    "sprint_grid": RACE_KEY,
+    "qualifyings": RACE_KEY,
+    "fastestlaps_detailed": RACE_KEY,
+    "practices": RACE_KEY + ["Detail"],
+    "pitstops": RACE_KEY + ["Stops"],
+    "driver_standings": ["Year", "DriverKey"],
+    "constructor_standings": ["Year", "Team"],
+}
+
+# Ambito en el que Pos debe ir de 1 al numero de participantes.
+POSITION_SCOPES = {
+    "race_details": ["Year", "Grand Prix"],
+    "starting_grids": ["Year", "Grand Prix"],
+    "sprint_results": ["Year", "Grand Prix"],
+    "sprint_grid": ["Year", "Grand Prix"],
+    "qualifyings": ["Year", "Grand Prix"],
+    "fastestlaps_detailed": ["Year", "Grand Prix"],
+    "practices": ["Year", "Grand Prix", "Detail"],
+    "driver_standings": ["Year"],
+    "constructor_standings": ["Year"],
+}
+
+ORPHAN_PAIRS = [
+    ("race_details", "starting_grids"),
+    ("starting_grids", "race_details"),
+    ("sprint_results", "sprint_grid"),
+    ("sprint_grid", "sprint_results"),
+]
+
+TOP_VALUES = 10
+
+
+def input_fingerprint(datasets, base_dir=BASE_DIR):
+    digest = hashlib.blake2b()
+    for name in sorted(datasets):
+        filename = datasets[name][0]
+        digest.update(filename.encode("utf-8"))
+        with open(Path(base_dir) / filename, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _coerced(series, parser):
+    raw = series.where(series.astype("string").str.strip() != "")
+    failed = raw.notna() & parser(raw).isna()
+    values = raw[failed].astype(str).value_counts().head(TOP_VALUES)
+    return {"count": int(failed.sum()), "values": {k: int(v) for k, v in values.items()}}
+
+
+def _keys(df, cols):
+    if "DriverKey" in cols and "DriverKey" not in df.columns:
+        df = add_driver_key(df)
+    if not set(cols).issubset(df.columns):
+        return None
+    keys = df[cols].copy()
+    keys["Year"] = to_numeric(keys["Year"])
+    return keys
+
+
+def _out_of_range(df, scope):
+    keys = _keys(df, scope)
+    pos = to_numeric(df["Pos"])
+    entries = keys.groupby(scope, dropna=False)[scope[0]].transform("size")
+    invalid = (pos < 1) | (pos > entries) | (pos % 1 != 0)
+    return int((pos.notna() & invalid).sum())
+
+
+def validate_dataset(name, df):
+    report = {"rows": int(len(df)), "coerced": {}}
+    for col in NUMERIC_COLUMNS.get(name, []):
+        if col in df.columns:
+            report["coerced"][col] = _coerced(df[col], to_numeric)
+    for col in TIME_COLUMNS.get(name, []):
+        if col in df.columns:
+            report["coerced"][f"{col} (tiempo)"] = _coerced(df[col], parse_time)
+
+    cols = UNIQUE_KEYS.get(name)
+    keys = _keys(df, cols) if cols else None
+    if keys is not None:
+        report["duplicate_keys"] = int(keys.duplicated().sum())
+    scope = POSITION_SCOPES.get(name)
+    if scope and "Pos" in df.columns and set(scope).issubset(df.columns):
+        report["out_of_range_pos"] = _out_of_range(df, scope)
+    return report
+
+
+def _orphans(frames):
+    result = {}
+    for left, right in ORPHAN_PAIRS:
+        if left not in frames or right not in frames:
+            continue
+        left_keys = _keys(frames[left], RACE_KEY).dropna()
+        right_keys = _keys(frames[right], RACE_KEY).dropna()
+        present = pd.MultiIndex.from_frame(left_keys).isin(
+            pd.MultiIndex.from_frame(right_keys)
+        )
+        result[f"{left} sin {right}"] = int((~present).sum())
+    return result
+
+
+def validate_frames(frames):
+    return {
+        "datasets": {name: validate_dataset(name, df) for name, df in frames.items()},
+        "orphans": _orphans(frames),
+    }
+
+
+def cached_validation(frames, datasets, report_path, base_dir=BASE_DIR):
+    report_path = Path(report_path)
+    fingerprint = input_fingerprint(datasets, base_dir)
+    if report_path.exists():
+        with open(report_path, "r", encoding="utf-8") as handle:
+            cached = json.load(handle)
+        if cached.get("fingerprint") == fingerprint:
+            return cached, False
+
+    report = {
+        "fingerprint": fingerprint,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        **validate_frames({name: frames[name] for name in datasets}),
+    }
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=True, indent=2)
+    return report, True